@@ -1,102 +1,381 @@
-from typing import List
-from fastapi import FastAPI, HTTPException
+import asyncio
+import codecs
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
+from typing import Callable, List, Optional
+from fastapi import APIRouter, Depends, FastAPI, HTTPException, Request, Response
+from fastapi.responses import PlainTextResponse, StreamingResponse
+from starlette.background import BackgroundTask
 
 import core
-from project.api_models import ChatResponse, ChatRequest
-from project.api_utils import AgentSwitchHandler, process_tool_calls, format_message
+from project.admission import AdmissionRejected, create_admission_controller
+from project.api_models import (
+    BatchChatRequest,
+    BatchChatResponse,
+    BatchChatResult,
+    ChatResponse,
+    ChatRequest,
+    ImportResponse,
+    InventoryMovementsRequest,
+    InventoryMovementsResponse,
+)
+from project.bulk_import import ProductImporter
+from project.context_policy import RollingSummarizer, create_context_policy
+from project.conversation_store import ConversationStore, create_conversation_store
+from project.database import dispose_engine, get_engine, pool_stats
+from project.intent_router import create_intent_router
+from project.product_queries import StockError
+from project.metrics import (
+    CHAT_SECONDS,
+    HANDOFFS,
+    REGISTRY,
+    TIMING_HEADERS,
+    request_timer,
+    span,
+)
+from project.response_cache import create_response_cache, is_cacheable_turn
+from project.singleflight import SingleFlight
+from project.api_utils import (
+    AgentSwitchHandler,
+    process_tool_calls,
+    format_message,
+    format_sse,
+)
 
 
+# Número máximo de turnos de chat ejecutándose a la vez en este worker.
+# Swarm y el cliente de OpenAI son bloqueantes, así que cada turno ocupa un hilo.
+CHAT_WORKERS = int(os.getenv("SWARM_CHAT_WORKERS", "8"))
 
-app = FastAPI()
+# Turnos de un mismo lote de /chat/batch que se ejecutan a la vez, y tamaño máximo del lote
+BATCH_PARALLELISM = int(os.getenv("SWARM_CHAT_BATCH_PARALLELISM", str(CHAT_WORKERS)))
+BATCH_MAX_ITEMS = int(os.getenv("SWARM_CHAT_BATCH_MAX_ITEMS", "100"))
 
-client = core.client
-starting_agent = core.triage_agent
 
-current_agent_memory = {}
-conversation_memory = {}
+async def iterate_in_executor(executor, generator_function, *args):
+    """
+    Recorre un generador síncrono en `executor` y entrega sus elementos
+    al event loop a medida que se producen.
+    """
+    loop = asyncio.get_running_loop()
+    queue = asyncio.Queue()
+    cancelled = threading.Event()
+    end = object()
+
+    def produce():
+        generator = generator_function(*args)
+        try:
+            for item in generator:
+                if cancelled.is_set():
+                    break
+                loop.call_soon_threadsafe(queue.put_nowait, item)
+        except Exception as e:
+            loop.call_soon_threadsafe(queue.put_nowait, e)
+        finally:
+            generator.close()
+            loop.call_soon_threadsafe(queue.put_nowait, end)
+
+    loop.run_in_executor(executor, produce)
+    try:
+        while True:
+            item = await queue.get()
+            if item is end:
+                break
+            if isinstance(item, Exception):
+                raise item
+            yield item
+    finally:
+        # Si el cliente se desconecta, el hilo deja de leer del modelo
+        cancelled.set()
 
 
-@app.post("/chat", response_model=List[ChatResponse])
-async def chat(request: ChatRequest):
+class ChatServices:
     """
-    Endpoint para manejar solicitudes de chat con memoria y cambios de agente
+    Estado de una aplicación: pool de chat, almacén de conversaciones,
+    políticas, cachés y control de admisión. Se crea al arrancar la
+    aplicación (lifespan) y se cierra al apagarla, así que importar el
+    módulo no crea nada y cada aplicación tiene el suyo.
+    """
+
+    def __init__(self):
+        self.chat_executor = ThreadPoolExecutor(
+            max_workers=CHAT_WORKERS, thread_name_prefix="swarm-chat"
+        )
+        self.conversation_store: ConversationStore = create_conversation_store()
+        self.context_policy = create_context_policy()
+        self.intent_router = create_intent_router()
+        self.response_cache = create_response_cache()
+        self.admission = create_admission_controller(CHAT_WORKERS)
+        self.chat_flight = SingleFlight(
+            timeout=float(os.getenv("SWARM_CHAT_SINGLEFLIGHT_TIMEOUT", "60"))
+        )
+        self.summarizer = RollingSummarizer(
+            lambda: core.get_client().client,
+            self.conversation_store,
+            model=os.getenv("SWARM_SUMMARY_MODEL", "gpt-4o-mini"),
+        )
+
+    def shutdown(self) -> None:
+        self.chat_executor.shutdown(wait=False, cancel_futures=True)
+        self.summarizer.shutdown()
+
+
+# Servicios de la última aplicación arrancada, para las métricas del proceso
+active_services: Optional[ChatServices] = None
+
+# Segundos que tardó la inicialización del worker en el arranque de la aplicación
+startup_seconds = None
+
+
+def warm_up() -> ChatServices:
+    """
+    Crea el cliente, el registro de agentes, el engine y los servicios de la
+    aplicación, y arranca el canal entre workers. Nada de esto se hace al
+    importar el módulo.
+    """
+    core.get_client()
+    core.get_agents()
+    get_engine()
+    core.start_catalog_channel()
+    return ChatServices()
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    global active_services, startup_seconds
+    start = time.perf_counter()
+    services = await asyncio.get_running_loop().run_in_executor(None, warm_up)
+    app.state.services = active_services = services
+    startup_seconds = time.perf_counter() - start
+    yield
+    services.shutdown()
+    if active_services is services:
+        active_services = None
+    core.stop_catalog_channel()
+    core.model_policy.shutdown()
+    if core.tool_executor is not None:
+        core.tool_executor.shutdown()
+    dispose_engine()
+
+
+def get_services(request: Request) -> ChatServices:
+    services = getattr(request.app.state, "services", None)
+    if services is None:
+        raise RuntimeError("The application has not started (lifespan did not run)")
+    return services
+
+
+router = APIRouter()
+
+
+def load_session(services: ChatServices, user_id: str):
+    """
+    Retorna el agente actual, los últimos turnos guardados del usuario (los
+    que pueden entrar en la ventana de contexto) y la posición del primero
+    de ellos en el historial
+    """
+    conversation_store = services.conversation_store
+    agent_name = conversation_store.get_agent_name(user_id)
+    agents = core.get_agents()
+    current_agent = agents.get(agent_name) or agents[core.TRIAGE_AGENT]
+    history, offset = conversation_store.get_recent_history(
+        user_id, services.context_policy.max_turns
+    )
+    return current_agent, history, offset
+
+
+def route_locally(
+    services: ChatServices, agent, message: str, agent_switch_handler: AgentSwitchHandler
+):
+    """
+    Si el usuario está con el Triage Agent y el mensaje es claramente
+    clasificable, retorna directamente el agente destino sin llamar al modelo
+    """
+    intent_router = services.intent_router
+    if intent_router is None or agent.name != core.TRIAGE_AGENT:
+        return None
+    function_name = intent_router.route(message)
+    if function_name is None:
+        return None
+    agent = agent_switch_handler.agent_functions[function_name]
+    HANDOFFS.inc(agent=agent.name, via="router")
+    return agent
+
+
+def build_context(
+    services: ChatServices, user_id: str, agent, history: List[dict], offset: int
+) -> List[dict]:
+    """
+    Recorta el historial según la política de contexto del agente y programa
+    en segundo plano el resumen de los mensajes que quedan fuera
+    """
+    with span("context"):
+        summary, _ = services.conversation_store.get_summary(user_id)
+        messages, window_start = services.context_policy.build_messages(
+            history, agent.name, summary, offset
+        )
+        services.summarizer.schedule(user_id, window_start)
+    return messages
+
+
+# Los cambios de agente no impiden cachear un turno
+cacheable_switch_tools = set(core.HANDOFF_TOOLS)
+
+
+def format_turn(
+    messages: List[dict],
+    agent_switch_handler: AgentSwitchHandler,
+    agent_switch: Optional[str] = None,
+) -> List[ChatResponse]:
+    """
+    Convierte los mensajes de un turno en respuestas de la API.
+    Los mensajes posteriores a un cambio de agente se marcan con el nuevo agente.
+    """
+    formatted_response = []
+    for message in messages:
+        new_agent = process_tool_calls(message, agent_switch_handler)
+        if new_agent:
+            agent_switch = new_agent.name
+        if message.get("content"):
+            formatted_response.append(format_message(message, agent_switch))
+    return formatted_response
+
+
+def save_turn(
+    services: ChatServices,
+    user_id: str,
+    user_message: dict,
+    agent_name: str,
+    formatted_response: List[ChatResponse],
+) -> None:
+    """
+    Guarda el agente final y el turno en la memoria del usuario.
+    Solo guardamos la última respuesta, no los mensajes intermedios.
+    """
+    conversation_store = services.conversation_store
+    with span("save"):
+        conversation_store.set_agent_name(user_id, agent_name)
+        new_messages = [user_message]
+        if formatted_response:
+            new_messages.append(
+                {"role": "assistant", "content": formatted_response[-1].content}
+            )
+        conversation_store.append_messages(user_id, new_messages)
+
+
+def lookup_cached_turn(services: ChatServices, agent, messages: List[dict]):
+    """
+    Busca una respuesta cacheada para este agente e historial.
+    Retorna (clave, versión del catálogo, respuesta o None).
+    """
+    response_cache = services.response_cache
+    catalog_version = core.product_cache.version
+    if response_cache is None:
+        return None, catalog_version, None
+    with span("cache"):
+        cache_key = response_cache.make_key(agent, messages, catalog_version)
+        return cache_key, catalog_version, response_cache.get(cache_key, catalog_version)
+
+
+def is_read_only_turn(response) -> bool:
+    return is_cacheable_turn(
+        response.messages, core.READ_ONLY_TOOLS, cacheable_switch_tools
+    )
+
+
+def cache_turn(
+    services: ChatServices,
+    cache_key,
+    catalog_version: int,
+    response,
+    formatted_response: List[ChatResponse],
+) -> None:
+    """
+    Guarda la respuesta del turno si solo usó herramientas de lectura
+    """
+    if cache_key is None or not is_read_only_turn(response):
+        return
+    services.response_cache.set(
+        cache_key,
+        {
+            "agent": response.agent.name,
+            "responses": [r.model_dump() for r in formatted_response],
+        },
+        catalog_version,
+    )
+
+
+def run_chat(services: ChatServices, request: ChatRequest) -> List[ChatResponse]:
+    """
+    Ejecuta un turno de chat completo de forma síncrona.
+    Se llama desde el pool de hilos para no bloquear el event loop.
     """
     user_id = request.context.get("user_id")
-    if user_id not in conversation_memory:
-        conversation_memory[user_id] = []
-        current_agent_memory[user_id] = starting_agent
 
-    # Obtener el agente actual para este usuario
-    current_agent = current_agent_memory.get(user_id, starting_agent)
+    # Obtener el agente actual y el historial de este usuario
+    with span("session"):
+        current_agent, history, offset = load_session(services, user_id)
     agent_switch_handler = AgentSwitchHandler()
 
+    # Si el enrutador local reconoce la intención, nos saltamos el Triage Agent
+    with span("route"):
+        routed_agent = route_locally(
+            services, current_agent, request.message, agent_switch_handler
+        )
+    if routed_agent:
+        current_agent = routed_agent
+
     # Agregar mensaje del usuario al historial
-    conversation_memory[user_id].append({"role": "user", "content": request.message})
+    user_message = {"role": "user", "content": request.message}
+    messages = build_context(
+        services, user_id, current_agent, history + [user_message], offset
+    )
 
-    formatted_response = []
-    try:
-        # Enviar historial completo al cliente usando el agente actual
-        response = client.run(
+    # Las preguntas de solo lectura repetidas se responden desde la caché
+    cache_key, catalog_version, cached = lookup_cached_turn(
+        services, current_agent, messages
+    )
+    if cached is not None:
+        formatted_response = [ChatResponse(**r) for r in cached["responses"]]
+        save_turn(services, user_id, user_message, cached["agent"], formatted_response)
+        return formatted_response
+
+    def run_turn():
+        # Swarm aplica los cambios de agente (Result(agent=...)) dentro de la
+        # misma ejecución, así que una sola llamada cubre todo el turno
+        response = core.get_client().run(
             agent=current_agent,
-            messages=conversation_memory[user_id],
+            messages=messages,
             context_variables=request.context,
             stream=request.stream,
         )
 
         if request.stream:
             for chunk in response:
-                if chunk and chunk.get("content"):
-                    new_agent = process_tool_calls(chunk, agent_switch_handler)
-                    if new_agent:
-                        current_agent_memory[user_id] = new_agent
-                        # Hacer una nueva llamada con el nuevo agente
-                        new_response = client.run(
-                            agent=new_agent,
-                            messages=conversation_memory[user_id],
-                            context_variables=request.context,
-                            stream=False,
-                        )
-                        # Solo tomamos la última respuesta del nuevo agente
-                        if new_response.messages:
-                            last_message = new_response.messages[-1]
-                            if last_message.get("content"):
-                                formatted_response.append(
-                                    format_message(last_message, new_agent.name)
-                                )
-                        break  # Salimos del loop después del cambio de agente
-                    else:
-                        formatted_response.append(format_message(chunk))
+                if "response" in chunk:
+                    response = chunk["response"]
+        return response
+
+    try:
+        if cache_key is None:
+            response = run_turn()
         else:
-            messages = response.messages
-            # Verificar si hay un cambio de agente en cualquiera de los mensajes
-            for message in messages:
-                new_agent = process_tool_calls(message, agent_switch_handler)
-                if new_agent:
-                    current_agent_memory[user_id] = new_agent
-                    # Hacer una nueva llamada con el nuevo agente
-                    new_response = client.run(
-                        agent=new_agent,
-                        messages=conversation_memory[user_id],
-                        context_variables=request.context,
-                        stream=False,
-                    )
-                    # Solo tomamos la última respuesta del nuevo agente
-                    if new_response.messages:
-                        last_message = new_response.messages[-1]
-                        if last_message.get("content"):
-                            formatted_response.append(
-                                format_message(last_message, new_agent.name)
-                            )
-                    break  # Salimos del loop después del cambio de agente
-                elif message.get("content"):
-                    formatted_response.append(format_message(message))
-
-        # Solo actualizamos la memoria de conversación con la última respuesta
-        if formatted_response:
-            conversation_memory[user_id].append(
-                {"role": "assistant", "content": formatted_response[-1].content}
+            # Los turnos idénticos y simultáneos esperan la respuesta del primero,
+            # siempre que esa respuesta sea de solo lectura y se pueda compartir
+            response = services.chat_flight.do(
+                cache_key, run_turn, shareable=is_read_only_turn
             )
 
+        formatted_response = format_turn(
+            response.messages,
+            agent_switch_handler,
+            routed_agent.name if routed_agent else None,
+        )
+        cache_turn(services, cache_key, catalog_version, response, formatted_response)
+        save_turn(services, user_id, user_message, response.agent.name, formatted_response)
         return formatted_response
 
     except Exception as e:
@@ -105,17 +384,423 @@ async def chat(request: ChatRequest):
         )
 
 
+async def admit(services: ChatServices, request: ChatRequest) -> Callable[[], None]:
+    """
+    Espera el turno de la petición según el control de admisión y retorna la
+    función que lo libera. Responde 429/503 si la petición no se admite.
+    """
+    admission = services.admission
+    if admission is None:
+        return lambda: None
+    try:
+        return await admission.acquire(str(request.context.get("user_id")))
+    except AdmissionRejected as e:
+        raise HTTPException(status_code=e.status_code, detail=e.detail, headers=e.headers)
+
+
+def timed_run_chat(services: ChatServices, request: ChatRequest):
+    """
+    Ejecuta run_chat midiendo sus etapas; retorna (respuesta, RequestTimer)
+    """
+    with request_timer() as timer:
+        outcome = "error"
+        try:
+            formatted_response = run_chat(services, request)
+            outcome = "ok"
+            return formatted_response, timer
+        finally:
+            CHAT_SECONDS.observe(timer.elapsed(), endpoint="/chat", outcome=outcome)
+
+
+async def run_admitted_chat(services: ChatServices, request: ChatRequest):
+    """
+    Espera el turno de la petición y ejecuta run_chat en el pool de chat.
+    Retorna (respuesta, RequestTimer).
+    """
+    release = await admit(services, request)
+    try:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(
+            services.chat_executor, timed_run_chat, services, request
+        )
+    finally:
+        release()
+
+
+@router.post("/chat", response_model=List[ChatResponse])
+async def chat(
+    request: ChatRequest, response: Response, services: ChatServices = Depends(get_services)
+):
+    """
+    Endpoint para manejar solicitudes de chat con memoria y cambios de agente
+    """
+    formatted_response, timer = await run_admitted_chat(services, request)
+    if TIMING_HEADERS:
+        response.headers["Server-Timing"] = timer.server_timing()
+    return formatted_response
+
+
+@router.post("/chat/batch", response_model=BatchChatResponse)
+async def chat_batch(batch: BatchChatRequest, services: ChatServices = Depends(get_services)):
+    """
+    Ejecuta varios turnos de chat independientes en una sola petición.
+    Los turnos de usuarios distintos se ejecutan a la vez (como mucho
+    SWARM_CHAT_BATCH_PARALLELISM); los de un mismo usuario, en el orden del
+    lote. Cada turno tiene su propio resultado o error.
+    """
+    if len(batch.requests) > BATCH_MAX_ITEMS:
+        raise HTTPException(
+            status_code=413,
+            detail=f"A batch can have at most {BATCH_MAX_ITEMS} requests",
+        )
+
+    results: List[Optional[BatchChatResult]] = [None] * len(batch.requests)
+    slots = asyncio.Semaphore(max(1, BATCH_PARALLELISM))
+
+    def batch_user_id(request: ChatRequest) -> Optional[str]:
+        # El contexto admite cualquier tipo de user_id (como en /chat); en el
+        # resultado y para agrupar se usa como texto
+        user_id = request.context.get("user_id")
+        return None if user_id is None else str(user_id)
+
+    async def run_item(index: int, request: ChatRequest):
+        responses, status_code, error = None, 200, None
+        try:
+            async with slots:
+                responses, _ = await run_admitted_chat(services, request)
+        except HTTPException as e:
+            status_code, error = e.status_code, str(e.detail)
+        except Exception as e:
+            status_code, error = 500, f"Error processing request: {e}"
+        results[index] = BatchChatResult(
+            index=index,
+            user_id=batch_user_id(request),
+            status_code=status_code,
+            responses=responses,
+            error=error,
+        )
+
+    async def run_user(items):
+        for index, request in items:
+            await run_item(index, request)
+
+    by_user = {}
+    for index, request in enumerate(batch.requests):
+        by_user.setdefault(batch_user_id(request), []).append((index, request))
+    await asyncio.gather(*(run_user(items) for items in by_user.values()))
+    return BatchChatResponse(results=results)
+
+
+def stream_chat(services: ChatServices, request: ChatRequest):
+    """
+    Ejecuta un turno de chat en modo streaming y produce eventos
+    (nombre, datos) a medida que Swarm entrega los fragmentos.
+    """
+    user_id = request.context.get("user_id")
+    with span("session"):
+        current_agent, history, offset = load_session(services, user_id)
+    agent_switch_handler = AgentSwitchHandler()
+
+    with span("route"):
+        routed_agent = route_locally(
+            services, current_agent, request.message, agent_switch_handler
+        )
+    if routed_agent:
+        current_agent = routed_agent
+        yield "agent_switch", {"agent_switch": routed_agent.name}
+
+    user_message = {"role": "user", "content": request.message}
+    messages = build_context(
+        services, user_id, current_agent, history + [user_message], offset
+    )
+
+    cache_key, catalog_version, cached = lookup_cached_turn(
+        services, current_agent, messages
+    )
+    if cached is not None:
+        formatted_response = [ChatResponse(**r) for r in cached["responses"]]
+        save_turn(services, user_id, user_message, cached["agent"], formatted_response)
+        # Igual que en el streaming normal, solo se envían los textos del asistente
+        for r in formatted_response:
+            if r.sender == "tool":
+                continue
+            yield "sender", {"sender": r.sender}
+            yield "delta", {"content": r.content}
+        yield "done", {"agent": cached["agent"]}
+        return
+
+    response = core.get_client().run(
+        agent=current_agent,
+        messages=messages,
+        context_variables=request.context,
+        stream=True,
+    )
+
+    sender = None
+    for chunk in response:
+        if "response" in chunk:
+            final_response = chunk["response"]
+            formatted_response = format_turn(
+                final_response.messages,
+                agent_switch_handler,
+                routed_agent.name if routed_agent else None,
+            )
+            cache_turn(services, cache_key, catalog_version, final_response, formatted_response)
+            save_turn(
+                services, user_id, user_message, final_response.agent.name, formatted_response
+            )
+            yield "done", {"agent": final_response.agent.name}
+            continue
+
+        if chunk.get("sender") and chunk["sender"] != sender:
+            sender = chunk["sender"]
+            yield "sender", {"sender": sender}
+
+        if chunk.get("content"):
+            yield "delta", {"content": chunk["content"]}
+
+        for tool_call in chunk.get("tool_calls") or []:
+            new_agent = agent_switch_handler.handle_tool_call(tool_call)
+            if new_agent:
+                yield "agent_switch", {"agent_switch": new_agent.name}
+
+
+def timed_stream_chat(services: ChatServices, request: ChatRequest):
+    """
+    Ejecuta stream_chat midiendo sus etapas. Como las cabeceras ya se enviaron
+    cuando termina el turno, los tiempos van en el evento 'done'.
+    """
+    with request_timer() as timer:
+        outcome = "error"
+        try:
+            for event, data in stream_chat(services, request):
+                if event == "done" and TIMING_HEADERS:
+                    data = {**data, "timings": timer.timings_ms()}
+                yield event, data
+            outcome = "ok"
+        finally:
+            CHAT_SECONDS.observe(timer.elapsed(), endpoint="/chat/stream", outcome=outcome)
+
+
+@router.post("/chat/stream")
+async def chat_stream(request: ChatRequest, services: ChatServices = Depends(get_services)):
+    """
+    Endpoint de chat que envía la respuesta como Server-Sent Events:
+    'sender', 'delta' (fragmentos de texto), 'agent_switch', 'done' y 'error'
+    """
+    # La admisión se decide antes de empezar a responder, para poder usar 429/503
+    release = await admit(services, request)
+
+    async def events():
+        try:
+            async for event, data in iterate_in_executor(
+                services.chat_executor, timed_stream_chat, services, request
+            ):
+                yield format_sse(event, data)
+        except Exception as e:
+            yield format_sse("error", {"detail": f"Error processing request: {str(e)}"})
+        finally:
+            release()
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+        # Si el cliente se desconecta antes de recibir el primer evento,
+        # el generador no llega a ejecutarse y el turno se libera aquí
+        background=BackgroundTask(release),
+    )
+
+
 # Endpoint para reiniciar al agente inicial
-@app.post("/reset-agent/{user_id}")
-async def reset_agent(user_id: str):
+@router.post("/reset-agent/{user_id}")
+async def reset_agent(user_id: str, services: ChatServices = Depends(get_services)):
     """
     Reinicia el agente al agente de triaje inicial
     """
-    current_agent_memory[user_id] = starting_agent
-    return {"message": "Agent reset to triage agent", "agent_name": starting_agent.name}
+    services.conversation_store.set_agent_name(user_id, core.TRIAGE_AGENT)
+    return {"message": "Agent reset to triage agent", "agent_name": core.TRIAGE_AGENT}
+
+
+@router.post("/products/import", response_model=ImportResponse)
+async def import_products(request: Request, format: Optional[str] = None):
+    """
+    Importa productos desde el cuerpo de la petición, en CSV con cabecera
+    (nombre,precio,cantidad_en_almacen,descuento_por_devolucion) o en NDJSON.
+    El cuerpo se lee por partes y se inserta en lotes; las filas inválidas
+    se reportan sin detener la importación. Si el archivo deja de ser legible
+    después de insertar algún lote, se responde con el reporte parcial y el
+    motivo en `stopped`; si no se insertó nada, con 400.
+    """
+    if format is None:
+        content_type = request.headers.get("content-type", "")
+        format = "ndjson" if "ndjson" in content_type or "jsonl" in content_type else "csv"
+    try:
+        importer = ProductImporter(
+            get_engine(), format=format, chunk_size=core.IMPORT_CHUNK_SIZE
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    loop = asyncio.get_running_loop()
+    decoder = codecs.getincrementaldecoder("utf-8")()
+    buffer = ""
+    lines = []
+    try:
+        async for data in request.stream():
+            buffer += decoder.decode(data)
+            *complete, buffer = buffer.split("\n")
+            lines.extend(complete)
+            # El parseo y la inserción se hacen fuera del event loop
+            if len(lines) >= importer.chunk_size:
+                await loop.run_in_executor(None, importer.add_lines, lines)
+                lines = []
+        lines.append(buffer + decoder.decode(b"", final=True))
+        await loop.run_in_executor(None, importer.import_lines, lines)
+    except (ValueError, UnicodeDecodeError) as e:
+        if not importer.inserted:
+            raise HTTPException(status_code=400, detail=f"Invalid import file: {str(e)}")
+        importer.stop(f"invalid import file: {e}")
+    finally:
+        # Los lotes se confirman a medida que se completan, así que la caché
+        # se invalida aunque la importación no termine
+        if importer.inserted:
+            await loop.run_in_executor(None, core.catalog_changed)
+    return importer.report()
+
+
+@router.post("/products/stock-movements", response_model=InventoryMovementsResponse)
+async def stock_movements(request: InventoryMovementsRequest):
+    """
+    Aplica movimientos de inventario (sumas o restas a la cantidad en almacén)
+    en una sola transacción: se aplican todos o ninguno. Responde 404 si un
+    producto no existe y 409 si hay varios productos con ese nombre o si la
+    cantidad quedaría negativa.
+    """
+    movements = [(movement.nombre, movement.cantidad) for movement in request.movements]
+    if not movements:
+        raise HTTPException(status_code=400, detail="No movements were provided")
+    loop = asyncio.get_running_loop()
+    try:
+        quantities = await loop.run_in_executor(
+            None, core.move_stock, movements, request.allow_negative
+        )
+    except StockError as e:
+        status_code = 404 if e.reason == "not_found" else 409
+        raise HTTPException(status_code=status_code, detail=str(e))
+    return InventoryMovementsResponse(applied=len(movements), cantidades=quantities)
+
+
+@router.get("/router-stats")
+async def router_stats(services: ChatServices = Depends(get_services)):
+    """
+    Retorna cuántos mensajes resolvió el enrutador local (hits) y cuántos
+    tuvieron que pasar por el Triage Agent (misses)
+    """
+    if services.intent_router is None:
+        return {"enabled": False}
+    return {"enabled": True, **services.intent_router.stats()}
+
+
+@router.get("/response-cache-stats")
+async def response_cache_stats(services: ChatServices = Depends(get_services)):
+    """
+    Retorna la tasa de aciertos de la caché de respuestas del modelo
+    """
+    if services.response_cache is None:
+        return {"enabled": False}
+    return {
+        "enabled": True,
+        **services.response_cache.stats(),
+        "singleflight": services.chat_flight.stats(),
+        "tool_singleflight": core.product_flight.stats(),
+    }
+
+
+@router.get("/admission-stats")
+async def admission_stats(services: ChatServices = Depends(get_services)):
+    """
+    Retorna las peticiones de chat en ejecución y en espera
+    """
+    if services.admission is None:
+        return {"enabled": False}
+    return {"enabled": True, **services.admission.stats()}
 
 
-@app.get("/")
+@router.get("/pool-stats")
+async def database_pool_stats():
+    """
+    Retorna el estado del pool de conexiones a la base de datos
+    """
+    return pool_stats()
+
+
+def database_pool_connections() -> dict:
+    stats = pool_stats()
+    return {
+        (state,): stats[state]
+        for state in ("checked_in", "checked_out", "overflow")
+        if state in stats
+    }
+
+
+def conversation_sessions() -> int:
+    if active_services is None:
+        return 0
+    return active_services.conversation_store.size()
+
+
+def admission_requests() -> dict:
+    admission = active_services.admission if active_services else None
+    stats = admission.stats() if admission else {}
+    return {
+        (state,): stats.get(state, 0) for state in ("active", "waiting", "waiting_user")
+    }
+
+
+REGISTRY.gauge(
+    "swarm_conversation_sessions",
+    "Conversations held by the conversation store",
+    conversation_sessions,
+)
+REGISTRY.gauge(
+    "swarm_admission_requests",
+    "Chat requests running, waiting for a slot and waiting for the user's previous turn",
+    admission_requests,
+    ("state",),
+)
+REGISTRY.gauge(
+    "swarm_model_latency_ewma_seconds",
+    "Moving average of each model's observed latency (time to first byte when streaming)",
+    core.model_policy.tracker.latencies,
+    ("model", "stream"),
+)
+REGISTRY.gauge(
+    "swarm_startup_seconds",
+    "Time spent creating the client, agents and engine when the worker started",
+    lambda: startup_seconds or 0,
+)
+REGISTRY.gauge(
+    "swarm_db_pool_connections",
+    "Database pool connections by state",
+    database_pool_connections,
+    ("state",),
+)
+
+
+@router.get("/metrics")
+async def metrics():
+    """
+    Métricas en formato Prometheus: etapas de cada turno, llamadas al modelo,
+    tokens, herramientas, cambios de agente, consultas SQL y pool de conexiones
+    """
+    loop = asyncio.get_running_loop()
+    # El tamaño del almacén SQL requiere una consulta, así que no se lee en el event loop
+    body = await loop.run_in_executor(None, REGISTRY.render)
+    return PlainTextResponse(body, media_type="text/plain; version=0.0.4")
+
+
+@router.get("/")
 async def home():
     """
     Endpoint de inicio para verificar el estado del servidor.
@@ -125,6 +810,21 @@ async def home():
     }
 
 
+def create_app() -> FastAPI:
+    """
+    Crea la aplicación. El cliente, los agentes, el engine y los servicios
+    (ChatServices) se crean al arrancar (lifespan), así que importar este
+    módulo no necesita credenciales ni crea nada. Cada arranque crea sus
+    propios servicios y los cierra al apagarse.
+    """
+    application = FastAPI(lifespan=lifespan)
+    application.include_router(router)
+    return application
+
+
+app = create_app()
+
+
 if __name__ == "__main__":
     import uvicorn
 
@@ -0,0 +1,239 @@
+"""
+Servidor local compatible con la API de OpenAI (/v1/chat/completions) para
+benchmarks sin red.
+
+Responde con un guion fijo según las herramientas que recibe cada agente:
+- Triage Agent (tiene talk_to_lister): transfiere al Agent Lister.
+- Agent Lister (tiene get_all_products): llama a get_all_products con el
+  producto mencionado en el mensaje del usuario.
+- Tras el resultado de una herramienta (que no sea un cambio de agente):
+  responde con un texto final.
+- Cualquier otro agente: responde con un texto.
+
+Uso:
+    python -m benchmarks.fake_openai --port 8100 --latency-ms 300
+"""
+
+import argparse
+import asyncio
+import itertools
+import json
+import random
+import re
+import time
+from typing import Dict, Iterable, Optional
+
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+
+class FakeOpenAIConfig:
+    def __init__(
+        self,
+        latency_ms: float = 200,
+        jitter_ms: float = 50,
+        chunk_delay_ms: float = 5,
+        answer_words: int = 40,
+        model_latency_ms: Optional[Dict[str, float]] = None,
+        failing_models: Iterable[str] = (),
+    ):
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.chunk_delay_ms = chunk_delay_ms
+        self.answer_words = answer_words
+        # Latencia propia de algunos modelos, y modelos que siempre responden 500
+        self.model_latency_ms = model_latency_ms or {}
+        self.failing_models = set(failing_models)
+
+
+_ids = itertools.count()
+
+
+def _tool_names(body: dict) -> set:
+    return {tool["function"]["name"] for tool in body.get("tools") or []}
+
+
+def _last_user_message(messages: list) -> str:
+    for message in reversed(messages):
+        if message.get("role") == "user":
+            return message.get("content") or ""
+    return ""
+
+
+def scripted_step(body: dict, config: FakeOpenAIConfig) -> dict:
+    """
+    Decide la respuesta del modelo: {"content": str} o {"tool_calls": [(nombre, argumentos)]}
+    """
+    messages = body["messages"]
+    tools = _tool_names(body)
+
+    last = messages[-1]
+    if last.get("role") == "tool" and not (last.get("tool_name") or "").startswith("talk_to_"):
+        words = " ".join(f"token{i}" for i in range(config.answer_words))
+        return {"content": f"Here is what I found: {words}."}
+    if "talk_to_lister" in tools:
+        return {"tool_calls": [("talk_to_lister", {})]}
+    if "get_all_products" in tools:
+        match = re.search(r"producto (\S+)", _last_user_message(messages))
+        return {
+            "tool_calls": [
+                ("get_all_products", {"filter": match.group(1) if match else None, "limit": 20})
+            ]
+        }
+    return {"content": "How can I help you with the products?"}
+
+
+def _tool_calls(step: dict) -> list:
+    return [
+        {
+            "id": f"call_{next(_ids)}",
+            "type": "function",
+            "function": {"name": name, "arguments": json.dumps(arguments)},
+        }
+        for name, arguments in step.get("tool_calls") or []
+    ]
+
+
+def _usage(body: dict, step: dict, prefixes: set) -> dict:
+    # Como la caché de prompts del proveedor: si las herramientas y el mensaje
+    # de sistema son idénticos a los de una petición anterior, esos tokens
+    # se cuentan como cacheados
+    prefix = json.dumps([body.get("tools"), body["messages"][:1]])
+    prefix_tokens = len(prefix) // 4
+    cached_tokens = prefix_tokens if prefix in prefixes else 0
+    prefixes.add(prefix)
+    rest = sum(len(m.get("content") or "") for m in body["messages"][1:]) // 4
+    prompt_tokens = prefix_tokens + rest
+    completion_tokens = len(step.get("content") or "") // 4 + 10 * len(step.get("tool_calls") or [])
+    return {
+        "prompt_tokens": prompt_tokens,
+        "completion_tokens": completion_tokens,
+        "total_tokens": prompt_tokens + completion_tokens,
+        "prompt_tokens_details": {"cached_tokens": cached_tokens},
+    }
+
+
+def parse_model_latency(values: Iterable[str]) -> Dict[str, float]:
+    """
+    Convierte ["gpt-4=2000", ...] en {"gpt-4": 2000.0, ...}
+    """
+    latencies = {}
+    for value in values:
+        model, _, ms = value.partition("=")
+        latencies[model] = float(ms)
+    return latencies
+
+
+def create_fake_openai_app(config: FakeOpenAIConfig) -> FastAPI:
+    app = FastAPI()
+    app.state.requests = 0
+    app.state.requests_by_model = {}
+    app.state.prompt_prefixes = set()
+    app.state.prompt_tokens = 0
+    app.state.cached_prompt_tokens = 0
+
+    @app.post("/v1/chat/completions")
+    async def chat_completions(request: Request):
+        body = await request.json()
+        app.state.requests += 1
+        model = body.get("model", "gpt-4o")
+        app.state.requests_by_model[model] = app.state.requests_by_model.get(model, 0) + 1
+        step = scripted_step(body, config)
+        latency = config.model_latency_ms.get(model, config.latency_ms)
+        latency += random.uniform(-config.jitter_ms, config.jitter_ms)
+        await asyncio.sleep(max(latency, 0) / 1000)
+        if model in config.failing_models:
+            return JSONResponse(
+                {"error": {"message": f"{model} is unavailable", "type": "server_error"}},
+                status_code=500,
+            )
+
+        base = {
+            "id": f"chatcmpl-{next(_ids)}",
+            "created": int(time.time()),
+            "model": model,
+        }
+        tool_calls = _tool_calls(step)
+        usage = _usage(body, step, app.state.prompt_prefixes)
+        app.state.prompt_tokens += usage["prompt_tokens"]
+        app.state.cached_prompt_tokens += usage["prompt_tokens_details"]["cached_tokens"]
+
+        if not body.get("stream"):
+            message = {"role": "assistant", "content": step.get("content")}
+            if tool_calls:
+                message["tool_calls"] = tool_calls
+            return JSONResponse(
+                {
+                    **base,
+                    "object": "chat.completion",
+                    "choices": [
+                        {
+                            "index": 0,
+                            "message": message,
+                            "finish_reason": "tool_calls" if tool_calls else "stop",
+                        }
+                    ],
+                    "usage": usage,
+                }
+            )
+
+        async def chunks():
+            def chunk(delta, finish_reason=None):
+                data = {
+                    **base,
+                    "object": "chat.completion.chunk",
+                    "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason}],
+                }
+                return f"data: {json.dumps(data)}\n\n"
+
+            yield chunk({"role": "assistant", "content": ""})
+            for word in step["content"].split(" ") if step.get("content") else []:
+                await asyncio.sleep(config.chunk_delay_ms / 1000)
+                yield chunk({"content": word + " "})
+            for index, tool_call in enumerate(tool_calls):
+                yield chunk({"tool_calls": [{"index": index, **tool_call}]})
+            yield chunk({}, "tool_calls" if tool_calls else "stop")
+            if (body.get("stream_options") or {}).get("include_usage"):
+                # Como la API real: un último fragmento sin choices con el uso
+                data = {**base, "object": "chat.completion.chunk", "choices": [], "usage": usage}
+                yield f"data: {json.dumps(data)}\n\n"
+            yield "data: [DONE]\n\n"
+
+        return StreamingResponse(chunks(), media_type="text/event-stream")
+
+    @app.get("/stats")
+    async def stats():
+        return {
+            "requests": app.state.requests,
+            "by_model": app.state.requests_by_model,
+            "prompt_tokens": app.state.prompt_tokens,
+            "cached_prompt_tokens": app.state.cached_prompt_tokens,
+        }
+
+    return app
+
+
+if __name__ == "__main__":
+    import uvicorn
+
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8100)
+    parser.add_argument("--latency-ms", type=float, default=200)
+    parser.add_argument("--jitter-ms", type=float, default=50)
+    parser.add_argument("--chunk-delay-ms", type=float, default=5)
+    parser.add_argument(
+        "--model-latency", action="append", default=[], metavar="MODEL=MS",
+        help="latency of one model, e.g. gpt-4=2000 (repeatable)",
+    )
+    parser.add_argument("--failing-model", action="append", default=[])
+    args = parser.parse_args()
+
+    config = FakeOpenAIConfig(
+        args.latency_ms,
+        args.jitter_ms,
+        args.chunk_delay_ms,
+        model_latency_ms=parse_model_latency(args.model_latency),
+        failing_models=args.failing_model,
+    )
+    uvicorn.run(create_fake_openai_app(config), host=args.host, port=args.port)
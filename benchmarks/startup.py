@@ -0,0 +1,97 @@
+"""
+Mide el arranque en frío de la aplicación en un intérprete nuevo:
+cuánto tarda `import app` (sin credenciales) y cuánto la inicialización
+del worker en el lifespan (cliente, agentes, engine).
+
+Uso:
+    python -m benchmarks.startup
+    python -m benchmarks.startup --runs 5 --top 15
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+MEASURE = """
+import json, time
+start = time.perf_counter()
+import app
+imported = time.perf_counter() - start
+import core
+eager = {"client": core._client is not None, "agents": core._agents is not None}
+import project.database as database
+eager["engine"] = database._engine is not None
+
+import asyncio, os
+os.environ["BTECH_OPENAI_API_KEY"] = "startup-benchmark"
+
+async def start():
+    application = app.create_app()
+    async with app.lifespan(application):
+        pass
+
+asyncio.run(start())
+print(json.dumps({"import": imported, "warm_up": app.startup_seconds, "eager": eager}))
+"""
+
+
+def run_once(env: dict) -> dict:
+    result = subprocess.run(
+        [sys.executable, "-c", MEASURE], cwd=ROOT, env=env, capture_output=True, text=True
+    )
+    if result.returncode != 0:
+        raise RuntimeError(result.stderr)
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def slowest_imports(env: dict, top: int):
+    """
+    Retorna los módulos con mayor tiempo acumulado de importación,
+    según `-X importtime`
+    """
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import app"],
+        cwd=ROOT, env=env, capture_output=True, text=True,
+    )
+    rows = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:"):
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        if self_us.strip().isdigit():
+            rows.append((int(cumulative_us), int(self_us), name.strip()))
+    rows.sort(reverse=True)
+    return rows[:top]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Cold start benchmark")
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--top", type=int, default=10, help="slowest imports to show")
+    args = parser.parse_args(argv)
+
+    env = {
+        key: value for key, value in os.environ.items() if key != "BTECH_OPENAI_API_KEY"
+    }
+    env["SWARM_DB_CONNECTION"] = f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'startup.sqlite')}"
+
+    runs = [run_once(env) for _ in range(args.runs)]
+    imports = [r["import"] for r in runs]
+    warm_ups = [r["warm_up"] for r in runs]
+    print(f"import app:  median {statistics.median(imports) * 1000:.0f} ms  (runs: {args.runs})")
+    print(f"warm up:     median {statistics.median(warm_ups) * 1000:.0f} ms")
+    print(f"created at import: {', '.join(k for k, v in runs[0]['eager'].items() if v) or 'nothing'}")
+
+    print("\nSlowest imports (cumulative ms / self ms):")
+    for cumulative, self_us, name in slowest_imports(env, args.top):
+        print(f"  {cumulative / 1000:8.1f} {self_us / 1000:8.1f}  {name}")
+
+
+if __name__ == "__main__":
+    main()
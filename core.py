@@ -1,67 +1,215 @@
-from swarm import Swarm, Agent
-from swarm.core import Result
-
-from openai import OpenAI
-
 from dotenv import load_dotenv
-from typing import Optional, List, Dict, Union
+from typing import TYPE_CHECKING, Optional, List, Dict, Tuple, Union
+import csv
 import os
-from sqlmodel import Session, select
+import threading
+from sqlmodel import Session
 
-from project.database import engine
+from project.database import get_engine
 from project.models import Producto
-from project.core_utils import run_demo_loop, process_and_print_streaming_response
+from project.bulk_import import ProductImporter
+from project.product_cache import ProductCache, create_catalog_channel
+from project.product_queries import (
+    StockError,
+    aggregate_products,
+    apply_stock_movements,
+    delete_products_by_name,
+    list_products,
+    parse_fields,
+    update_products_by_name,
+)
+from project.agent_prompts import PromptRegistry
+from project.model_policy import create_model_policy
+from project.singleflight import SingleFlight
+from project.tool_executor import create_tool_executor
+from project.tool_format import TOOL_MAX_ROWS, compact_enabled, format_table
+
+if TYPE_CHECKING:
+    from swarm import Agent
+    from project.swarm_client import SwarmClient
 
 load_dotenv()
 
+# Nombres de los agentes, que también se guardan en el almacén de conversaciones
+TRIAGE_AGENT = "Triage Agent"
+LISTER_AGENT = "Agent Lister"
+ADDER_AGENT = "Agent Adder"
+DELETER_AGENT = "Agent Deleter"
+UPDATER_AGENT = "Agent Updater"
+
+# Herramientas de cambio de agente y el agente al que transfieren
+HANDOFF_TOOLS = {
+    "talk_to_lister": LISTER_AGENT,
+    "talk_to_adder": ADDER_AGENT,
+    "talk_to_deleter": DELETER_AGENT,
+    "talk_to_updater": UPDATER_AGENT,
+    "talk_to_triage_agent": TRIAGE_AGENT,
+}
+
+# El cliente, los agentes y el canal entre workers se crean en el primer uso
+# (o al arrancar la aplicación), no al importar este módulo: así importar
+# `core` no necesita credenciales ni conexión a la base de datos.
+_client = None
+_agents = None
+_init_lock = threading.Lock()
+catalog_channel = None
+
+# Mensaje de sistema y esquema de herramientas de cada agente, calculados al
+# construir el registro de agentes
+prompt_registry = PromptRegistry()
+
+# Modelo primario, fallback, plazos y hedging de cada agente (SWARM_MODEL_POLICY)
+model_policy = create_model_policy()
+
+product_cache = ProductCache(
+    max_entries=int(os.getenv("SWARM_PRODUCT_CACHE_SIZE", "256")),
+    ttl_seconds=float(os.getenv("SWARM_PRODUCT_CACHE_TTL", "30")),
+)
+product_flight = SingleFlight(timeout=float(os.getenv("SWARM_TOOL_SINGLEFLIGHT_TIMEOUT", "10")))
+
+# Herramientas que solo leen el catálogo. Los turnos que solo usan estas
+# herramientas (y cambios de agente) pueden reutilizar respuestas cacheadas.
+READ_ONLY_TOOLS = {"get_all_products", "get_product_stats"}
+
+# Las lecturas de un mismo mensaje del modelo se ejecutan en paralelo (SWARM_TOOL_WORKERS)
+tool_executor = create_tool_executor(READ_ONLY_TOOLS)
+
+# Tamaño máximo de página de get_all_products
+PRODUCT_PAGE_MAX = int(os.getenv("SWARM_PRODUCT_PAGE_MAX", "200"))
+
+# Filas por lote (un executemany por lote) en las importaciones masivas
+IMPORT_CHUNK_SIZE = int(os.getenv("SWARM_IMPORT_CHUNK_SIZE", "1000"))
+
+
+def get_client() -> "SwarmClient":
+    """
+    Retorna el cliente de Swarm, creándolo en el primer uso
+    """
+    global _client
+    if _client is None:
+        with _init_lock:
+            if _client is None:
+                from openai import OpenAI
+                from project.swarm_client import SwarmClient
+
+                api_key = os.getenv("BTECH_OPENAI_API_KEY")
+                if not api_key:
+                    raise RuntimeError("BTECH_OPENAI_API_KEY is not set")
+                _client = SwarmClient(
+                    client=OpenAI(api_key=api_key),
+                    model_policy=model_policy,
+                    tool_executor=tool_executor,
+                    prompt_registry=prompt_registry,
+                )
+    return _client
+
+
+def get_agents() -> Dict[str, "Agent"]:
+    """
+    Retorna el registro de agentes por nombre. Se construye una sola vez.
+    """
+    global _agents
+    if _agents is None:
+        with _init_lock:
+            if _agents is None:
+                agents = build_agents()
+                prompt_registry.freeze(agents.values())
+                _agents = agents
+    return _agents
+
+
+def get_agent(name: str) -> "Agent":
+    return get_agents()[name]
+
+
+def start_catalog_channel() -> None:
+    """
+    Crea y arranca el canal de invalidación entre workers, si está configurado
+    """
+    global catalog_channel
+    if catalog_channel is None:
+        catalog_channel = create_catalog_channel(get_engine(), product_cache)
+        if catalog_channel is not None:
+            catalog_channel.start()
+
+
+def stop_catalog_channel() -> None:
+    global catalog_channel
+    if catalog_channel is not None:
+        catalog_channel.stop()
+        catalog_channel = None
+
+
+def __getattr__(name):
+    # Compatibilidad con `core.client` y `core.triage_agent`, `core.agent_lister`...
+    if name == "client":
+        return get_client()
+    agent_name = _AGENT_ATTRIBUTES.get(name)
+    if agent_name is not None:
+        return get_agent(agent_name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+_AGENT_ATTRIBUTES = {
+    "triage_agent": TRIAGE_AGENT,
+    "agent_lister": LISTER_AGENT,
+    "agent_adder": ADDER_AGENT,
+    "agent_deleter": DELETER_AGENT,
+    "agent_updater": UPDATER_AGENT,
+}
+
+
+def transfer_to(agent_name: str, value: str = ""):
+    """
+    Resultado de una herramienta que cambia al agente `agent_name`
+    """
+    from swarm.types import Result
+
+    return Result(value=value, agent=get_agent(agent_name))
+
 
-client = Swarm(client=OpenAI(api_key=os.environ["BTECH_OPENAI_API_KEY"]))
+def catalog_changed():
+    """
+    Invalida la caché de productos en este worker y avisa al resto
+    """
+    product_cache.invalidate()
+    if catalog_channel is not None:
+        catalog_channel.publish()
 
 
 def talk_to_lister():
     """Use this function when the user's request involves listing products from the database.
     Directly transfers the user and their request to the Data Listing Agent, so the user doesn't need to repeat their request, bypassing any additional input steps.
     """
-    return Result(
-        agent=agent_lister,
-    )
+    return transfer_to(LISTER_AGENT)
 
 
 def talk_to_deleter():
     """Use this function when the user's request involves deleting a product from the database.
     Directly transfers the user and their request to the Data Deleting Agent, so the user doesn't need to repeat their request, bypassing any additional input steps.
     """
-    return Result(
-        agent=agent_deleter,
-    )
+    return transfer_to(DELETER_AGENT)
 
 
 def talk_to_adder():
     """Use this function when the user's request involves adding a new product to the database.
     Directly transfers the user and their request to the Data Adding Agent, so the user doesn't need to repeat their request, bypassing any additional input steps.
     """
-    return Result(
-        agent=agent_adder,
-    )
+    return transfer_to(ADDER_AGENT)
 
 
 def talk_to_triage_agent():
     """Use this function if the user requests a task that falls outside your capabilities.
     Transfers the user directly to the Triage Agent for appropriate assistance.
     """
-    return Result(
-        value="Done, I will transfer you to the Triage Agent.",
-        agent=triage_agent,
-    )
+    return transfer_to(TRIAGE_AGENT, "Done, I will transfer you to the Triage Agent.")
 
 
 def talk_to_updater():
     """Use this function when the user's request involves updating a product in the database.
     Directly transfers the user and their request to the Data Updating Agent, so the user doesn't need to repeat their request, bypassing any additional input steps.
     """
-    return Result(
-        agent=agent_updater,
-    )
+    return transfer_to(UPDATER_AGENT)
 
 
 def user_info(context_variables):
@@ -71,84 +219,196 @@ def user_info(context_variables):
     user_id = context_variables["user_id"]
     user_name = context_variables["user_name"]
     enterprise_name = context_variables["enterprise_name"]
-    return Result(
-        value=f"Help the user, {user_name} from {enterprise_name} Company, do whatever they want.The user_id is {user_id}"
-    )
-
-
-triage_agent = Agent(
-    name="Triage Agent",
-    instructions="Determine which agent is best suited to handle the user's request, and transfer the conversation to that agent, including the user's request so it can be handled directly.",
-    functions=[
-        talk_to_lister,
-        talk_to_adder,
-        talk_to_deleter,
-        talk_to_updater,
-        user_info,
-    ],
-)
-
-
-def get_all_products(filter: Optional[str]) -> Union[List[Dict], str]:
+    return f"Help the user, {user_name} from {enterprise_name} Company, do whatever they want.The user_id is {user_id}"
+
+
+def get_all_products(
+    filter: Optional[str],
+    limit: int = 50,
+    cursor: Optional[str] = None,
+    fields: Optional[str] = None,
+    order_by: str = "nombre",
+    descending: bool = False,
+    fuzzy: bool = False,
+    min_precio: Optional[float] = None,
+    max_precio: Optional[float] = None,
+    min_cantidad: Optional[int] = None,
+    max_cantidad: Optional[int] = None,
+) -> Union[Dict, str]:
     """
-    Retrieves all products from the database with optional name filtering.
+    Retrieves one page of products from the database with optional name filtering.
 
     Args:
         filter (Optional[str]): Search term to filter products by name. If None, returns all products.
                               The search is case-insensitive and matches partial names.
 
+        limit (int): Maximum number of products to return in this page (default 50; larger values are capped).
+
+        cursor (Optional[str]): The 'next_cursor' value from a previous call, to get the next page.
+                              If None, returns the first page.
+
+        fields (Optional[str]): Comma-separated list of fields to return, e.g. "nombre,precio".
+                              If None, returns all fields.
+
+        order_by (str): Field used to sort the products: nombre, precio, cantidad_en_almacen,
+                      descuento_por_devolucion (default nombre), or "relevance" to show the
+                      products whose name best matches the filter first (requires a filter).
+
+        descending (bool): Sort in descending order if True. Ignored when sorting by relevance.
+
+        fuzzy (bool): If True, also match names similar to the filter, so misspelled searches
+                    (e.g. "manzna") still find the product. Use it with order_by="relevance"
+                    when a normal search finds nothing.
+
+        min_precio, max_precio (Optional[float]): Only return products whose price is within this range (inclusive).
+
+        min_cantidad, max_cantidad (Optional[int]): Only return products whose stock (cantidad_en_almacen)
+                              is within this range (inclusive), e.g. max_cantidad=4 for "stock below 5".
+
     Returns:
-        Union[List[Dict], str]: If products are found, returns a list of dictionaries containing product details:
-                               - nombre (str): Product name
-                               - precio (float): Product price
-                               - cantidad_en_almacen (int): Quantity in stock
-                               - descuento_por_devolucion (float): Return discount
-                               If no products are found, returns the string "No products found in the database."
-    """
-    with Session(engine) as session:
-        if filter == None:
-            productos = session.exec(select(Producto)).all()
-        else:
-            productos = session.exec(
-                select(Producto).where(Producto.nombre.ilike(f"%{filter}%"))
-            ).all()
-        if productos:
-            return [
-                {
-                    "nombre": p.nombre,
-                    "precio": p.precio,
-                    "cantidad_en_almacen": p.cantidad_en_almacen,
-                    "descuento_por_devolucion": p.descuento_por_devolucion,
-                }
-                for p in productos
-            ]
+        str: If products are found, a compact table:
+             - first line: "total: <products matching the filter>, showing: <products in this page>"
+             - second line: the names of the requested fields, comma-separated
+             - then one line per product with its values in the same order (CSV)
+             - if there are more products, a last line
+               '[more available: call again with cursor="<next_cursor>"]'
+             If no products are found, returns the string "No products found in the database."
+    """
+    try:
+        selected_fields = parse_fields(fields)
+    except ValueError as e:
+        return str(e)
+    limit = max(1, min(int(limit), PRODUCT_PAGE_MAX))
+    if compact_enabled():
+        # La tabla compacta muestra como mucho TOOL_MAX_ROWS filas por página
+        limit = min(limit, TOOL_MAX_ROWS)
+    ranges = {
+        "min_precio": min_precio,
+        "max_precio": max_precio,
+        "min_cantidad": min_cantidad,
+        "max_cantidad": max_cantidad,
+    }
+
+    cache_key = (
+        "get_all_products",
+        filter,
+        limit,
+        cursor,
+        tuple(selected_fields),
+        order_by,
+        bool(descending),
+        bool(fuzzy),
+        tuple(ranges.values()),
+    )
+    cached = product_cache.get(cache_key)
+    if cached is not None:
+        return format_product_page(cached, selected_fields)
+
+    def load():
+        version = product_cache.version
+        with Session(get_engine()) as session:
+            page = list_products(
+                session,
+                filter=filter,
+                limit=limit,
+                cursor=cursor,
+                fields=selected_fields,
+                order_by=order_by,
+                descending=bool(descending),
+                fuzzy=bool(fuzzy),
+                ranges=ranges,
+            )
+        if page["total"]:
+            result = page
         else:
-            return "No products found in the database."
+            result = "No products found in the database."
+        product_cache.set(cache_key, result, version)
+        return result
+
+    # Las llamadas idénticas y simultáneas comparten una sola consulta
+    try:
+        return format_product_page(product_flight.do(cache_key, load), selected_fields)
+    except ValueError as e:
+        return str(e)
+
+
+def get_product_stats(
+    metrics: str = "count",
+    group_by: Optional[str] = None,
+    filter: Optional[str] = None,
+    min_precio: Optional[float] = None,
+    max_precio: Optional[float] = None,
+    min_cantidad: Optional[int] = None,
+    max_cantidad: Optional[int] = None,
+) -> str:
+    """
+    Computes statistics about the products directly in the database. Use it instead of
+    get_all_products to count, sum or find the minimum/maximum/average of products.
 
+    Args:
+        metrics (str): Comma-separated list of metrics. Each one is "count" or "<function>:<field>", where
+                     function is sum, min, max or avg and field is precio, cantidad_en_almacen,
+                     descuento_por_devolucion or valor_en_almacen (precio * cantidad_en_almacen).
+                     E.g. "count,sum:cantidad_en_almacen,sum:valor_en_almacen" (default "count").
 
-agent_lister = Agent(
-    name="Agent Lister",
-    model="gpt-4o-mini",
-    instructions="""
-    You are a helpful agent whose mission is to display all products in the database. 
+        group_by (Optional[str]): Field to group the products by (nombre, precio, cantidad_en_almacen or
+                                descuento_por_devolucion). If None, computes the metrics over all matching products.
 
-    If a user requests to see a specific product from the beginning, call the function 'get_all_products' with the filter corresponding to the product name they provided. 
-    Do not ask any further questions in this case.
+        filter (Optional[str]): Only include products whose name contains this term.
 
-    If a user asks to see all products, inquire if they would like to see all products or if they prefer to filter by specific criteria.
+        min_precio, max_precio (Optional[float]): Only include products whose price is within this range (inclusive).
 
-    When displaying the products:
-    1. Format the output in a clear, readable manner.
-    2. If there are many products, consider grouping them or offering to show them in batches.
-    3. Provide a summary of the total number of products.
-    4. If no products are found, inform the user clearly.
-    
-    Be ready to answer questions about the products or offer to filter/sort them if asked.
+        min_cantidad, max_cantidad (Optional[int]): Only include products whose stock is within this range (inclusive).
 
-    If you cannot resolve a user's request, transfer the user to the Triage Agent with your function talk_to_triage_agent.
-    """,
-    functions=[get_all_products, user_info, talk_to_triage_agent],
-)
+    Returns:
+        str: A compact table: a "total: <groups>, showing: <rows>" line, a header line with the group field
+             and metric names (e.g. count, sum_cantidad_en_almacen) and one comma-separated line per group.
+    """
+    ranges = {
+        "min_precio": min_precio,
+        "max_precio": max_precio,
+        "min_cantidad": min_cantidad,
+        "max_cantidad": max_cantidad,
+    }
+    cache_key = ("get_product_stats", metrics, group_by, filter, tuple(ranges.values()))
+    cached = product_cache.get(cache_key)
+    if cached is not None:
+        return cached
+
+    def load():
+        version = product_cache.version
+        with Session(get_engine()) as session:
+            result = aggregate_products(
+                session,
+                metrics=metrics,
+                group_by=group_by,
+                filter=filter,
+                ranges=ranges,
+                limit=TOOL_MAX_ROWS,
+            )
+        table = format_table(
+            result["columns"], result["rows"], total=result["total"], max_rows=len(result["rows"])
+        )
+        if result["total"] > len(result["rows"]):
+            table += f"\n[more available: {result['total'] - len(result['rows'])} more groups not shown]"
+        product_cache.set(cache_key, table, version)
+        return table
+
+    try:
+        return product_flight.do(cache_key, load)
+    except ValueError as e:
+        return str(e)
+
+
+def format_product_page(page: Union[Dict, str], fields: List[str]) -> Union[Dict, str]:
+    """
+    Convierte una página de productos en la tabla compacta que ve el modelo
+    """
+    if isinstance(page, str) or not compact_enabled():
+        return page
+    return format_table(
+        fields, page["products"], total=page["total"], next_cursor=page["next_cursor"]
+    )
 
 
 def insert_a_product(
@@ -190,7 +450,7 @@ def insert_a_product(
     if missing_params:
         return f"No puedo insertar el producto hasta que me proporciones los siguientes parámetros: {', '.join(missing_params)}."
 
-    with Session(engine) as session:
+    with Session(get_engine()) as session:
         producto = Producto(
             nombre=nombre,
             precio=precio,
@@ -199,22 +459,45 @@ def insert_a_product(
         )
         session.add(producto)
         session.commit()
+    catalog_changed()
 
     return f"Done! The product {nombre} was inserted."
 
 
-agent_adder = Agent(
-    name="Agent Adder",
-    model="gpt-4o",
-    instructions="""
-    You are a helpful agent whose mission is to add products to the database. 
-    Your task is to use the function 'insert_a_product' to add products.
-    If you cannot resolve a user's request, transfer the user to the Triage Agent with you function talk_to_triage_agent .
+def insert_many_products(productos_csv: str):
+    """
+    Inserts many products into the database at once.
 
+    Args:
+        productos_csv (str): Products in CSV format, one product per line, with this header line first:
+                            nombre,precio,cantidad_en_almacen,descuento_por_devolucion
+                            nombre and precio are required; cantidad_en_almacen defaults to 0 and
+                            descuento_por_devolucion defaults to 10 when left empty.
+                            Example:
+                            nombre,precio,cantidad_en_almacen,descuento_por_devolucion
+                            Laptop,999.99,5,10
+                            Mouse,19.5,40,
 
-    """,
-    functions=[insert_a_product, user_info, talk_to_triage_agent],
-)
+    Returns:
+        A summary with the number of products inserted and the rows that were rejected, with the reason.
+        Valid rows are inserted even if other rows have errors.
+    """
+    importer = ProductImporter(get_engine(), format="csv", chunk_size=IMPORT_CHUNK_SIZE)
+    try:
+        importer.import_lines(productos_csv.splitlines())
+    except ValueError as e:
+        return f"No puedo insertar los productos: {e}."
+    if importer.inserted:
+        catalog_changed()
+
+    report = importer.report()
+    summary = f"Done! {report['inserted']} products were inserted."
+    if report["error_count"]:
+        details = "; ".join(
+            f"line {error['line']}: {error['error']}" for error in report["errors"][:10]
+        )
+        summary += f" {report['error_count']} rows had errors: {details}"
+    return summary
 
 
 def delete_a_product(nombre: str):
@@ -224,6 +507,7 @@ def delete_a_product(nombre: str):
     Args:
         nombre (str): Name of the product to be deleted.
                      The search is case-sensitive and requires an exact match.
+                     If several products share this name, all of them are deleted.
 
     Returns:
         If the product exists: Returns a confirmation message that the product was deleted.
@@ -236,31 +520,17 @@ def delete_a_product(nombre: str):
         >>> delete_a_product("NonexistentProduct")
         "Product NonexistentProduct not found in the database."
     """
-    with Session(engine) as session:
-        producto = session.exec(
-            select(Producto).where(Producto.nombre == nombre)
-        ).first()
-        if producto:
-            session.delete(producto)
-            session.commit()
-            return f"Done! The product {nombre} was deleted from the database."
-        else:
-            return f"Product {nombre} not found in the database."
-
+    with Session(get_engine()) as session:
+        deleted = delete_products_by_name(session, nombre)
+        session.commit()
 
-agent_deleter = Agent(
-    name="Agent Deleter",
-    model="gpt-4o",
-    instructions="""
-    You are a helpful agent whose mission is to delete products from the database. 
-    Your task is to use the function 'delete_a_product' to remove products from the database. 
-    Always confirm with the user before deleting a product.
-    If a product is not found, inform the user and suggest checking the spelling or listing available products.
-    If you cannot resolve a user's request, transfer the user to the Triage Agent with you function talk_to_triage_agent .
+    if not deleted:
+        return f"Product {nombre} not found in the database."
 
-    """,
-    functions=[delete_a_product, user_info, talk_to_triage_agent],
-)
+    catalog_changed()
+    if deleted > 1:
+        return f"Done! {deleted} products named {nombre} were deleted from the database."
+    return f"Done! The product {nombre} was deleted from the database."
 
 
 def update_a_product(
@@ -290,35 +560,162 @@ def update_a_product(
         nuevo_descuento (Optional[float]): New return discount percentage for the product.
                                          If None, the current discount remains unchanged.
     """
-    with Session(engine) as session:
-        producto = session.exec(
-            select(Producto).where(Producto.nombre == nombre)
-        ).first()
+    values = {
+        "nombre": nuevo_nombre,
+        "precio": nuevo_precio,
+        "cantidad_en_almacen": nueva_cantidad,
+        "descuento_por_devolucion": nuevo_descuento,
+    }
+    values = {field: value for field, value in values.items() if value is not None}
+    if not values:
+        return f"No new values were provided for the product {nombre}."
+
+    with Session(get_engine()) as session:
+        updated = update_products_by_name(session, nombre, values)
+        session.commit()
 
-        if not producto:
-            return f"Product {nombre} not found in the database."
+    if not updated:
+        return f"Product {nombre} not found in the database."
 
-        producto.nombre = nuevo_nombre if nuevo_nombre is not None else producto.nombre
-        producto.precio = nuevo_precio if nuevo_precio is not None else producto.precio
-        producto.cantidad_en_almacen = (
-            nueva_cantidad
-            if nueva_cantidad is not None
-            else producto.cantidad_en_almacen
-        )
-        producto.descuento_por_devolucion = (
-            nuevo_descuento
-            if nuevo_descuento is not None
-            else producto.descuento_por_devolucion
-        )
+    catalog_changed()
+    if updated > 1:
+        return f"Done! {updated} products named {nombre} were updated in the database."
+    return f"Done! The product {nombre} was updated in the database."
 
+
+def move_stock(movements: List[Tuple[str, int]], allow_negative: bool = False) -> Dict[str, int]:
+    """
+    Aplica los movimientos de inventario (nombre, delta) en una transacción
+    y retorna la cantidad nueva de cada producto. Lanza StockError si alguno
+    no se puede aplicar; en ese caso no se aplica ninguno.
+    """
+    with Session(get_engine()) as session:
+        try:
+            quantities = apply_stock_movements(session, movements, allow_negative)
+        except StockError:
+            session.rollback()
+            raise
         session.commit()
-        return f"Done! The product {nombre} was updated in the database."
+    catalog_changed()
+    return quantities
+
+
+def adjust_product_stock(nombre: str, cantidad: int):
+    """
+    Increases or decreases the stock (cantidad_en_almacen) of a product by a relative amount.
+    Use it for stock movements like "we received 10 units" or "we sold 3 units" instead of
+    computing the new quantity yourself; concurrent changes are applied correctly.
+
+    Args:
+        nombre (str): Name of the product.
+
+        cantidad (int): Units to add (positive, e.g. 10) or remove (negative, e.g. -3).
+                      The stock never goes below 0: if there are not enough units, nothing is changed.
+
+    Returns:
+        A message with the new stock, or the reason why it could not be changed.
+    """
+    try:
+        # Como en apply_inventory_movements: int("2.5") falla en lugar de truncar
+        amount = int(str(cantidad))
+    except ValueError:
+        return "Invalid movement: cantidad must be an integer. Nothing was changed."
+    try:
+        quantities = move_stock([(nombre, amount)])
+    except StockError as e:
+        return str(e)
+    return f"Done! The stock of {nombre} is now {quantities[nombre]}."
+
+
+def apply_inventory_movements(movimientos_csv: str):
+    """
+    Applies many stock movements at once, in a single transaction: either all of them are applied or none.
+
+    Args:
+        movimientos_csv (str): Movements in CSV format, one per line, with this header line first:
+                             nombre,cantidad
+                             cantidad is the number of units to add (positive) or remove (negative).
+                             Example:
+                             nombre,cantidad
+                             Laptop,5
+                             Mouse,-2
 
+    Returns:
+        A summary with the new stock of each product, or the movement that could not be applied.
+    """
+    reader = csv.DictReader(movimientos_csv.strip().splitlines())
+    if not reader.fieldnames or {"nombre", "cantidad"} - set(reader.fieldnames):
+        return "The movements need a header line: nombre,cantidad"
+    movements = []
+    for line, row in enumerate(reader, start=2):
+        try:
+            movements.append((row["nombre"].strip(), int(row["cantidad"])))
+        except (AttributeError, TypeError, ValueError):
+            return f"Invalid movement on line {line}: cantidad must be an integer. Nothing was changed."
+    if not movements:
+        return "No movements were provided."
+
+    try:
+        quantities = move_stock(movements)
+    except StockError as e:
+        return f"{e} Nothing was changed."
+    details = ", ".join(f"{nombre}: {cantidad}" for nombre, cantidad in quantities.items())
+    return f"Done! {len(movements)} movements were applied. New stock: {details}."
+
+
+TRIAGE_INSTRUCTIONS = "Determine which agent is best suited to handle the user's request, and transfer the conversation to that agent, including the user's request so it can be handled directly."
+
+LISTER_INSTRUCTIONS = """
+    You are a helpful agent whose mission is to display all products in the database. 
 
-agent_updater = Agent(
-    name="Agent Updater",
-    model="gpt-4",
-    instructions="""
+    If a user requests to see a specific product from the beginning, call the function 'get_all_products' with the filter corresponding to the product name they provided. 
+    Do not ask any further questions in this case.
+
+    If a user asks to see all products, inquire if they would like to see all products or if they prefer to filter by specific criteria.
+
+    When displaying the products:
+    1. Format the output in a clear, readable manner.
+    2. 'get_all_products' returns one batch at a time as a table: a "total/showing" line, a header line with the
+       field names and one comma-separated line per product. If it ends with a "[more available: ...]" line, tell the
+       user there are more products and, if they want to see them, call 'get_all_products' again with the same
+       arguments and the cursor given in that line.
+    3. Provide a summary of the total number of products using the 'total' value.
+    4. If no products are found, inform the user clearly. If a search by name finds nothing, try again
+       with fuzzy=true and order_by="relevance" in case the name was misspelled, and tell the user which
+       similar products you found.
+    5. If the user only needs some details (for example, just names and prices), use 'fields' to request only those,
+       and use 'order_by'/'descending' to sort instead of sorting the results yourself. To list products within a
+       price or stock range (e.g. "stock below 5"), use min_precio/max_precio/min_cantidad/max_cantidad.
+    6. For questions about counts, totals, averages, minimums or maximums (e.g. "how many products do we have",
+       "total stock value"), call 'get_product_stats' instead of listing products and computing the answer yourself.
+       For "the cheapest/most expensive product", call 'get_all_products' with order_by="precio", limit=1 and
+       descending as needed.
+    
+    Be ready to answer questions about the products or offer to filter/sort them if asked.
+
+    If you cannot resolve a user's request, transfer the user to the Triage Agent with your function talk_to_triage_agent.
+    """
+
+ADDER_INSTRUCTIONS = """
+    You are a helpful agent whose mission is to add products to the database. 
+    Your task is to use the function 'insert_a_product' to add products.
+    If the user gives you several products at once (for example a list or a supplier catalog),
+    add them all in a single call to 'insert_many_products' instead of calling 'insert_a_product' for each one.
+    If you cannot resolve a user's request, transfer the user to the Triage Agent with you function talk_to_triage_agent .
+
+
+    """
+
+DELETER_INSTRUCTIONS = """
+    You are a helpful agent whose mission is to delete products from the database. 
+    Your task is to use the function 'delete_a_product' to remove products from the database. 
+    Always confirm with the user before deleting a product.
+    If a product is not found, inform the user and suggest checking the spelling or listing available products.
+    If you cannot resolve a user's request, transfer the user to the Triage Agent with you function talk_to_triage_agent .
+
+    """
+
+UPDATER_INSTRUCTIONS = """
     You are a professional Product Update Agent whose mission is to safely modify existing products in the database.
     Your primary function is to use 'update_a_product' to make changes to product details while ensuring data integrity.
     
@@ -354,6 +751,13 @@ agent_updater = Agent(
     5. Update Execution:
        - If user types 'YES': Execute update_a_product with the new values
        - If user responds with anything else: Cancel the operation
+
+    Stock Movements:
+    - When the user reports units received or sold (e.g. "we received 10 laptops", "sold 3 mice"), use
+      'adjust_product_stock' with a positive or negative amount instead of computing 'nueva_cantidad' yourself.
+    - For several movements at once, use 'apply_inventory_movements' with one CSV line per product.
+    - Like any other update, show the current stock, the movement and the resulting stock, and ask for the
+      'YES' confirmation before calling them. Then report the new stock returned by the function.
     
     Important Guidelines:
     - NEVER create new products - this agent is for updates only
@@ -370,10 +774,66 @@ agent_updater = Agent(
     - If you cannot handle the user's request: Use talk_to_triage_agent function
     
     Remember: Your primary role is to ensure safe and accurate product updates while maintaining data integrity.
-    """,
-    functions=[update_a_product, get_all_products, user_info, talk_to_triage_agent],
-)
+    """
+
+
+def build_agents() -> Dict[str, "Agent"]:
+    """
+    Construye los agentes. Usar get_agents(), que los construye una sola vez.
+    """
+    from swarm import Agent
+
+    triage_agent = Agent(
+        name=TRIAGE_AGENT,
+        instructions=TRIAGE_INSTRUCTIONS,
+        functions=[
+            talk_to_lister,
+            talk_to_adder,
+            talk_to_deleter,
+            talk_to_updater,
+            user_info,
+        ],
+    )
+    agent_lister = Agent(
+        name=LISTER_AGENT,
+        model="gpt-4o-mini",
+        instructions=LISTER_INSTRUCTIONS,
+        functions=[get_all_products, get_product_stats, user_info, talk_to_triage_agent],
+    )
+    agent_adder = Agent(
+        name=ADDER_AGENT,
+        model="gpt-4o",
+        instructions=ADDER_INSTRUCTIONS,
+        functions=[insert_a_product, insert_many_products, user_info, talk_to_triage_agent],
+    )
+    agent_deleter = Agent(
+        name=DELETER_AGENT,
+        model="gpt-4o",
+        instructions=DELETER_INSTRUCTIONS,
+        functions=[delete_a_product, user_info, talk_to_triage_agent],
+    )
+    agent_updater = Agent(
+        name=UPDATER_AGENT,
+        model="gpt-4",
+        instructions=UPDATER_INSTRUCTIONS,
+        functions=[
+            update_a_product,
+            adjust_product_stock,
+            apply_inventory_movements,
+            get_all_products,
+            user_info,
+            talk_to_triage_agent,
+        ],
+    )
+    return {
+        agent.name: agent
+        for agent in (triage_agent, agent_lister, agent_adder, agent_deleter, agent_updater)
+    }
+
 
+# from project.core_utils import run_demo_loop, process_and_print_streaming_response
+# client = get_client()
+# triage_agent = get_agent(TRIAGE_AGENT)
 # run_demo_loop(
 #     client,
 #     triage_agent,
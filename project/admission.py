@@ -0,0 +1,231 @@
+import asyncio
+import math
+import os
+import time
+from collections import OrderedDict
+from typing import Callable, Dict, Optional
+
+from project.metrics import ADMISSION_REJECTIONS, ADMISSION_WAIT_SECONDS
+
+
+class AdmissionRejected(Exception):
+    """
+    La petición no se admite. `status_code` es 429 (límite del usuario)
+    o 503 (servidor saturado); `retry_after` son segundos sugeridos.
+    """
+
+    def __init__(self, status_code: int, detail: str, retry_after: float, reason: str):
+        super().__init__(detail)
+        self.status_code = status_code
+        self.detail = detail
+        self.retry_after = retry_after
+        self.reason = reason
+
+    @property
+    def headers(self) -> Dict[str, str]:
+        return {"Retry-After": str(max(1, math.ceil(self.retry_after)))}
+
+
+class TokenBucket:
+    def __init__(self, rate: float, burst: float):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated = time.monotonic()
+
+    def take(self) -> float:
+        """
+        Consume un token. Retorna 0 si había uno disponible, o los segundos
+        que faltan para el próximo token.
+        """
+        now = time.monotonic()
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return 0.0
+        return (1 - self.tokens) / self.rate
+
+
+class _UserLane:
+    def __init__(self):
+        # asyncio.Lock atiende a quienes esperan en orden de llegada
+        self.lock = asyncio.Lock()
+        self.pending = 0
+
+
+class AdmissionController:
+    """
+    Controla qué peticiones de chat se ejecutan:
+
+    - Limita la frecuencia por usuario con un token bucket (429).
+    - Ejecuta los turnos de un mismo usuario de uno en uno y en orden, con
+      una cola de como máximo `user_max_pending` peticiones por usuario. Un
+      turno espera al anterior del mismo usuario como mucho
+      `user_wait_timeout` segundos (429).
+    - Limita los turnos simultáneos del worker a `max_concurrent`; como mucho
+      `max_waiting` peticiones esperan un hueco, y ninguna más de
+      `queue_timeout` segundos (503). Así la latencia de las peticiones
+      admitidas no crece sin límite cuando hay sobrecarga. Las peticiones
+      que esperan el turno anterior de su usuario no cuentan para este
+      plazo ni para `max_waiting`.
+    """
+
+    def __init__(
+        self,
+        max_concurrent: int = 8,
+        max_waiting: int = 32,
+        queue_timeout: float = 10,
+        user_max_pending: int = 4,
+        user_wait_timeout: float = 60,
+        user_rate: float = 1,
+        user_burst: float = 5,
+        max_tracked_users: int = 10000,
+    ):
+        self.max_concurrent = max_concurrent
+        self.max_waiting = max_waiting
+        self.queue_timeout = queue_timeout
+        self.user_max_pending = user_max_pending
+        self.user_wait_timeout = user_wait_timeout
+        self.user_rate = user_rate
+        self.user_burst = user_burst
+        self.max_tracked_users = max_tracked_users
+        self.active = 0
+        # Peticiones con el turno de su usuario que esperan un hueco del servidor
+        self.waiting = 0
+        # Peticiones que esperan a que termine el turno anterior de su usuario
+        self.waiting_user = 0
+        self._buckets: "OrderedDict[str, TokenBucket]" = OrderedDict()
+        self._lanes: Dict[str, _UserLane] = {}
+        self._slots: Optional[asyncio.Semaphore] = None
+        self._loop = None
+
+    def _bind_loop(self) -> None:
+        # Las primitivas de asyncio pertenecen a un event loop; si la aplicación
+        # arranca de nuevo en otro loop, se crean otra vez
+        loop = asyncio.get_running_loop()
+        if loop is not self._loop:
+            self._loop = loop
+            self._slots = asyncio.Semaphore(self.max_concurrent)
+            self._lanes = {}
+            self.active = 0
+            self.waiting = 0
+            self.waiting_user = 0
+
+    def _reject(self, status_code: int, detail: str, retry_after: float, reason: str):
+        ADMISSION_REJECTIONS.inc(reason=reason)
+        raise AdmissionRejected(status_code, detail, retry_after, reason)
+
+    def _check_rate(self, user_id: str) -> None:
+        if self.user_rate <= 0:
+            return
+        bucket = self._buckets.get(user_id)
+        if bucket is None:
+            bucket = self._buckets[user_id] = TokenBucket(self.user_rate, self.user_burst)
+            # Un bucket olvidado equivale a uno lleno, así que se pueden descartar
+            while len(self._buckets) > self.max_tracked_users:
+                self._buckets.popitem(last=False)
+        self._buckets.move_to_end(user_id)
+        retry_after = bucket.take()
+        if retry_after:
+            self._reject(429, "Too many requests for this user", retry_after, "rate_limited")
+
+    async def acquire(self, user_id: str) -> Callable[[], None]:
+        """
+        Espera el turno de la petición y retorna la función que lo libera.
+        Lanza AdmissionRejected si la petición no se admite.
+        """
+        self._bind_loop()
+        self._check_rate(user_id)
+
+        lane = self._lanes.get(user_id)
+        if lane is not None and lane.pending >= self.user_max_pending:
+            self._reject(
+                429, "Too many pending requests for this user", 1, "user_queue_full"
+            )
+        if lane is None:
+            lane = self._lanes[user_id] = _UserLane()
+
+        lane.pending += 1
+        self.waiting_user += 1
+        start = time.monotonic()
+        user_locked = queued = slot_taken = False
+        try:
+            try:
+                await asyncio.wait_for(lane.lock.acquire(), self.user_wait_timeout)
+            except asyncio.TimeoutError:
+                # El servidor no está saturado: el turno anterior sigue en curso
+                self._reject(
+                    429, "The previous turn of this user is still running", 1, "user_wait_timeout"
+                )
+            finally:
+                self.waiting_user -= 1
+            user_locked = True
+            # Solo las peticiones con el turno de su usuario ocupan la cola del servidor
+            if self.active >= self.max_concurrent and self.waiting >= self.max_waiting:
+                self._reject(503, "Server is busy, try again later", 1, "queue_full")
+            self.waiting += 1
+            queued = True
+            await asyncio.wait_for(self._slots.acquire(), self.queue_timeout)
+            slot_taken = True
+        except asyncio.TimeoutError:
+            self._reject(503, "Server is busy, try again later", 1, "queue_timeout")
+        finally:
+            if queued:
+                self.waiting -= 1
+            if not slot_taken:
+                if user_locked:
+                    lane.lock.release()
+                self._leave(user_id, lane)
+
+        ADMISSION_WAIT_SECONDS.observe(time.monotonic() - start)
+        self.active += 1
+        released = False
+
+        def release() -> None:
+            nonlocal released
+            if released:
+                return
+            released = True
+            self.active -= 1
+            self._slots.release()
+            lane.lock.release()
+            self._leave(user_id, lane)
+
+        return release
+
+    def _leave(self, user_id: str, lane: _UserLane) -> None:
+        lane.pending -= 1
+        if lane.pending == 0 and self._lanes.get(user_id) is lane:
+            del self._lanes[user_id]
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "active": self.active,
+            "waiting": self.waiting,
+            "waiting_user": self.waiting_user,
+            "users_pending": len(self._lanes),
+            "max_concurrent": self.max_concurrent,
+            "max_waiting": self.max_waiting,
+        }
+
+
+def create_admission_controller(max_concurrent: int) -> Optional[AdmissionController]:
+    """
+    Crea el control de admisión, salvo que SWARM_ADMISSION_ENABLED sea 0.
+    Se configura con SWARM_ADMISSION_MAX_CONCURRENT, SWARM_ADMISSION_MAX_WAITING,
+    SWARM_ADMISSION_QUEUE_TIMEOUT, SWARM_USER_MAX_PENDING, SWARM_USER_WAIT_TIMEOUT,
+    SWARM_USER_RATE (peticiones por segundo, 0 para no limitar) y SWARM_USER_BURST.
+    """
+    if os.getenv("SWARM_ADMISSION_ENABLED", "1").lower() not in ("1", "true", "yes"):
+        return None
+    max_concurrent = int(os.getenv("SWARM_ADMISSION_MAX_CONCURRENT", str(max_concurrent)))
+    return AdmissionController(
+        max_concurrent=max_concurrent,
+        max_waiting=int(os.getenv("SWARM_ADMISSION_MAX_WAITING", str(4 * max_concurrent))),
+        queue_timeout=float(os.getenv("SWARM_ADMISSION_QUEUE_TIMEOUT", "10")),
+        user_max_pending=int(os.getenv("SWARM_USER_MAX_PENDING", "4")),
+        user_wait_timeout=float(os.getenv("SWARM_USER_WAIT_TIMEOUT", "60")),
+        user_rate=float(os.getenv("SWARM_USER_RATE", "1")),
+        user_burst=float(os.getenv("SWARM_USER_BURST", "5")),
+    )
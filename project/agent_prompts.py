@@ -0,0 +1,80 @@
+import inspect
+import threading
+from typing import Any, Dict, Iterable, List, Optional
+
+
+class FrozenPrompt:
+    """
+    Parte fija de las llamadas al modelo de un agente: el mensaje de sistema
+    (None si las instrucciones son una función, que se evalúa en cada
+    llamada) y el esquema de sus herramientas. Se calcula una sola vez, así
+    que el prefijo de cada petición es idéntico byte a byte entre llamadas y
+    el proveedor puede reutilizar su caché de prompts.
+    """
+
+    __slots__ = ("agent", "system_message", "tools")
+
+    def __init__(self, agent, system_message: Optional[Dict[str, str]], tools: List[Dict[str, Any]]):
+        self.agent = agent
+        self.system_message = system_message
+        self.tools = tools
+
+
+def tool_schema(function) -> Dict[str, Any]:
+    """
+    Esquema JSON de una herramienta, sin el parámetro context_variables
+    que el modelo no ve
+    """
+    # swarm se importa aquí para que importar core siga sin cargar openai
+    from swarm.core import __CTX_VARS_NAME__
+    from swarm.util import function_to_json
+
+    tool = function_to_json(function)
+    tool["function"]["description"] = normalize_instructions(tool["function"]["description"])
+    params = tool["function"]["parameters"]
+    params["properties"].pop(__CTX_VARS_NAME__, None)
+    if __CTX_VARS_NAME__ in params["required"]:
+        params["required"].remove(__CTX_VARS_NAME__)
+    return tool
+
+
+def normalize_instructions(instructions: str) -> str:
+    # Sin la sangría de las cadenas y docstrings de core.py: menos tokens y el mismo texto
+    return inspect.cleandoc(instructions)
+
+
+def freeze_prompt(agent) -> FrozenPrompt:
+    system_message = None
+    if not callable(agent.instructions):
+        system_message = {
+            "role": "system",
+            "content": normalize_instructions(agent.instructions),
+        }
+    tools = [tool_schema(function) for function in agent.functions]
+    return FrozenPrompt(agent, system_message, tools)
+
+
+class PromptRegistry:
+    """
+    Prompts congelados por nombre de agente. `freeze` los calcula al construir
+    el registro de agentes; un agente que no estaba (o que se reemplazó por
+    otro objeto con el mismo nombre) se congela en su primer uso.
+    """
+
+    def __init__(self):
+        self._prompts: Dict[str, FrozenPrompt] = {}
+        self._lock = threading.Lock()
+
+    def freeze(self, agents: Iterable) -> None:
+        prompts = {agent.name: freeze_prompt(agent) for agent in agents}
+        with self._lock:
+            self._prompts.update(prompts)
+
+    def get(self, agent) -> FrozenPrompt:
+        prompt = self._prompts.get(agent.name)
+        if prompt is None or prompt.agent is not agent:
+            prompt = freeze_prompt(agent)
+            with self._lock:
+                self._prompts[agent.name] = prompt
+        return prompt
+
@@ -28,3 +28,47 @@ class ChatResponse(BaseModel):
     content: str
     agent_switch: Optional[str] = None
     # tool_calls: Optional[List[ToolCall]] = None
+
+
+class BatchChatRequest(BaseModel):
+    requests: List[ChatRequest]
+
+
+class BatchChatResult(BaseModel):
+    index: int
+    user_id: Optional[str] = None
+    status_code: int
+    responses: Optional[List[ChatResponse]] = None
+    error: Optional[str] = None
+
+
+class BatchChatResponse(BaseModel):
+    results: List[BatchChatResult]
+
+
+class ImportRowError(BaseModel):
+    line: int
+    error: str
+
+
+class ImportResponse(BaseModel):
+    inserted: int
+    error_count: int
+    errors: List[ImportRowError] = []
+    # Si la importación se detuvo a medias, el motivo; las filas insertadas se mantienen
+    stopped: Optional[str] = None
+
+
+class InventoryMovement(BaseModel):
+    nombre: str
+    cantidad: int
+
+
+class InventoryMovementsRequest(BaseModel):
+    movements: List[InventoryMovement]
+    allow_negative: bool = False
+
+
+class InventoryMovementsResponse(BaseModel):
+    applied: int
+    cantidades: Dict[str, int]
@@ -1,21 +1,20 @@
+import json
 import core
-from swarm import Agent
-from typing import Optional
-from project.api_models import ChatResponse, ToolCall
+from typing import TYPE_CHECKING, Optional
+from project.api_models import ChatResponse
 
+if TYPE_CHECKING:
+    from swarm import Agent
 
 
 class AgentSwitchHandler:
     def __init__(self):
         self.agent_functions = {
-            "talk_to_lister": core.agent_lister,
-            "talk_to_adder": core.agent_adder,
-            "talk_to_deleter": core.agent_deleter,
-            "talk_to_updater": core.agent_updater,
-            "talk_to_triage_agent": core.triage_agent,
+            function_name: core.get_agent(agent_name)
+            for function_name, agent_name in core.HANDOFF_TOOLS.items()
         }
 
-    def handle_tool_call(self, tool_call: dict) -> Optional[Agent]:
+    def handle_tool_call(self, tool_call: dict) -> Optional["Agent"]:
         """
         Maneja una tool call y retorna el agente correspondiente si es un cambio de agente
         """
@@ -33,7 +32,7 @@ class AgentSwitchHandler:
 
 def process_tool_calls(
     message: dict, agent_switch_handler: AgentSwitchHandler
-) -> Optional[Agent]:
+) -> Optional["Agent"]:
     """
     Procesa los tool calls de un mensaje y retorna el nuevo agente si hay un cambio
     """
@@ -64,18 +63,15 @@ def format_message(
     # Asegurarse de que siempre haya un sender válido
     sender = message.get("sender") or message.get("role") or "assistant"
 
-    response = ChatResponse(
+    # ChatResponse no expone los tool_calls: los mensajes con texto y
+    # tool_calls a la vez se devuelven solo con su texto
+    return ChatResponse(
         sender=sender, content=message.get("content"), agent_switch=agent_switch
     )
 
-    if "tool_calls" in message and message["tool_calls"]:
-        response.tool_calls = [
-            ToolCall(
-                id=tool_call["id"],
-                type=tool_call["type"],
-                function=tool_call["function"],
-            )
-            for tool_call in message["tool_calls"]
-        ]
 
-    return response
\ No newline at end of file
+def format_sse(event: str, data: dict) -> str:
+    """
+    Formatea un evento para una respuesta Server-Sent Events
+    """
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
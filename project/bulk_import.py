@@ -0,0 +1,176 @@
+import csv
+import json
+from typing import Any, Dict, Iterable, List, Optional
+
+from sqlalchemy import insert
+from sqlmodel import Session
+
+from project.models import Producto
+
+
+# Máximo de errores por fila que se guardan en el reporte (el total se cuenta igual)
+MAX_REPORTED_ERRORS = 100
+
+
+def _number(row: Dict[str, Any], field: str, integer: bool, default: Any = None):
+    value = row.get(field)
+    if value is None or value == "":
+        if default is None:
+            raise ValueError(f"{field} is required")
+        return default
+    try:
+        number = float(value)
+    except (TypeError, ValueError):
+        raise ValueError(f"{field} must be a number, got {value!r}")
+    if number < 0:
+        raise ValueError(f"{field} cannot be negative")
+    if integer:
+        if not number.is_integer():
+            raise ValueError(f"{field} must be an integer, got {value!r}")
+        return int(number)
+    return number
+
+
+def validate_product(row: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Valida una fila y la convierte en los valores de un Producto.
+    Lanza ValueError con el motivo si la fila no es válida.
+    """
+    nombre = row.get("nombre")
+    if not isinstance(nombre, str) or not nombre.strip():
+        raise ValueError("nombre is required")
+    return {
+        "nombre": nombre.strip(),
+        "precio": _number(row, "precio", integer=False),
+        "cantidad_en_almacen": _number(row, "cantidad_en_almacen", integer=True, default=0),
+        "descuento_por_devolucion": _number(
+            row, "descuento_por_devolucion", integer=True, default=10
+        ),
+    }
+
+
+class ProductImporter:
+    """
+    Importa productos línea a línea (CSV con cabecera o NDJSON) y los inserta
+    en lotes de `chunk_size` filas con un solo executemany por lote.
+    Las filas inválidas se reportan y se saltan sin detener la importación.
+    """
+
+    def __init__(self, engine, format: str = "csv", chunk_size: int = 1000):
+        if format not in ("csv", "ndjson"):
+            raise ValueError(f"Unknown import format: {format}")
+        self.engine = engine
+        self.format = format
+        self.chunk_size = chunk_size
+        self.inserted = 0
+        self.error_count = 0
+        self.errors: List[Dict[str, Any]] = []
+        # Motivo por el que la importación se detuvo antes de terminar, si ocurrió
+        self.stopped: Optional[str] = None
+        self._header: Optional[List[str]] = None
+        self._line_number = 0
+        self._pending: List[Dict[str, Any]] = []
+
+    def _error(self, line: int, message: str) -> None:
+        self.error_count += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append({"line": line, "error": message})
+
+    def _parse(self, line: str) -> Optional[Dict[str, Any]]:
+        if self.format == "ndjson":
+            row = json.loads(line)
+            if not isinstance(row, dict):
+                raise ValueError("each line must be a JSON object")
+            return row
+
+        values = next(csv.reader([line]))
+        if self._header is None:
+            header = [v.strip() for v in values]
+            missing = [c for c in ("nombre", "precio") if c not in header]
+            if missing:
+                raise ValueError(f"CSV header is missing columns: {', '.join(missing)}")
+            self._header = header
+            return None
+        if len(values) != len(self._header):
+            raise ValueError(
+                f"expected {len(self._header)} columns, got {len(values)}"
+            )
+        return dict(zip(self._header, values))
+
+    def add_line(self, line: str) -> Optional[List[Dict[str, Any]]]:
+        """
+        Procesa una línea. Cuando se completa un lote lo retorna para que
+        se inserte con `insert`; si no, retorna None.
+        """
+        self._line_number += 1
+        line = line.strip()
+        if not line:
+            return None
+        try:
+            row = self._parse(line)
+            if row is None:
+                return None
+            self._pending.append(validate_product(row))
+        except ValueError as e:
+            if self._header is None and self.format == "csv":
+                # Sin una cabecera válida no se puede leer ninguna fila
+                raise
+            self._error(self._line_number, str(e))
+            return None
+
+        if len(self._pending) >= self.chunk_size:
+            chunk, self._pending = self._pending, []
+            return chunk
+        return None
+
+    def finish(self) -> List[Dict[str, Any]]:
+        """
+        Retorna las filas que quedaron pendientes del último lote
+        """
+        chunk, self._pending = self._pending, []
+        return chunk
+
+    def insert(self, rows: List[Dict[str, Any]]) -> None:
+        """
+        Inserta un lote en una transacción. Si la base de datos rechaza el
+        lote, se reporta como error y se sigue con el siguiente.
+        """
+        if not rows:
+            return
+        try:
+            with Session(self.engine) as session:
+                session.exec(insert(Producto), params=rows)
+                session.commit()
+            self.inserted += len(rows)
+        except Exception as e:
+            self._error(self._line_number, f"batch of {len(rows)} rows failed: {e}")
+
+    def add_lines(self, lines: Iterable[str]) -> None:
+        """
+        Procesa varias líneas e inserta cada lote que se complete
+        """
+        for line in lines:
+            chunk = self.add_line(line)
+            if chunk:
+                self.insert(chunk)
+
+    def import_lines(self, lines: Iterable[str]) -> None:
+        self.add_lines(lines)
+        self.insert(self.finish())
+
+    def stop(self, reason: str) -> None:
+        """
+        Marca la importación como interrumpida. Los lotes ya insertados se
+        mantienen; las filas pendientes se descartan.
+        """
+        self._pending = []
+        self.stopped = reason
+        self._error(self._line_number, f"import stopped: {reason}")
+
+    def report(self) -> Dict[str, Any]:
+        return {
+            "inserted": self.inserted,
+            "error_count": self.error_count,
+            "errors": self.errors,
+            "stopped": self.stopped,
+        }
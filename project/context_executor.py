@@ -0,0 +1,35 @@
+import contextvars
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+
+
+class ContextExecutor:
+    """
+    Pool de hilos que se crea en el primer uso y ejecuta cada tarea con una
+    copia de las variables de contexto de quien la envía, para que las
+    métricas de la petición sigan registrándose desde los hilos del pool
+    """
+
+    def __init__(self, max_workers: int, thread_name_prefix: str):
+        self.max_workers = max_workers
+        self.thread_name_prefix = thread_name_prefix
+        self._executor = None
+        self._lock = threading.Lock()
+
+    def submit(self, function, *args) -> Future:
+        if self._executor is None:
+            with self._lock:
+                if self._executor is None:
+                    self._executor = ThreadPoolExecutor(
+                        max_workers=self.max_workers,
+                        thread_name_prefix=self.thread_name_prefix,
+                    )
+        context = contextvars.copy_context()
+        return self._executor.submit(context.run, function, *args)
+
+    def shutdown(self) -> None:
+        # Tras cerrarlo, el siguiente submit crea un pool nuevo
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=False, cancel_futures=True)
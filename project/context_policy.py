@@ -0,0 +1,171 @@
+import json
+import logging
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional, Tuple
+
+
+logger = logging.getLogger(__name__)
+
+
+SUMMARY_INSTRUCTIONS = (
+    "You summarize conversations between a user and a product database assistant. "
+    "Merge the previous summary with the new messages into one short summary. "
+    "Keep product names, prices, quantities, pending confirmations and the user's goals. "
+    "Answer only with the summary."
+)
+
+
+def estimate_tokens(message: Dict) -> int:
+    """
+    Estimación aproximada de tokens de un mensaje (~4 caracteres por token)
+    """
+    content = message.get("content") or ""
+    return len(content) // 4 + 4
+
+
+class ContextPolicy:
+    """
+    Decide qué parte del historial se envía al modelo en cada turno:
+    los últimos `max_turns` turnos que quepan en el presupuesto de tokens del
+    agente, precedidos por el resumen de la conversación anterior si existe
+    """
+
+    def __init__(
+        self,
+        max_turns: int = 20,
+        token_budget: int = 6000,
+        agent_budgets: Optional[Dict[str, int]] = None,
+    ):
+        self.max_turns = max_turns
+        self.token_budget = token_budget
+        self.agent_budgets = agent_budgets or {}
+
+    def budget_for(self, agent_name: str) -> int:
+        return self.agent_budgets.get(agent_name, self.token_budget)
+
+    def window_start(self, messages: List[Dict], agent_name: str) -> int:
+        """
+        Retorna el índice del primer mensaje que entra en la ventana.
+        La ventana siempre empieza en un mensaje del usuario y siempre incluye
+        el último turno completo.
+        """
+        turn_starts = [i for i, m in enumerate(messages) if m.get("role") == "user"]
+        if not turn_starts:
+            return 0
+
+        turn_starts = turn_starts[-self.max_turns :]
+        budget = self.budget_for(agent_name)
+        start = turn_starts[-1]
+        used = sum(estimate_tokens(m) for m in messages[start:])
+
+        for candidate in reversed(turn_starts[:-1]):
+            cost = sum(estimate_tokens(m) for m in messages[candidate:start])
+            if used + cost > budget:
+                break
+            used += cost
+            start = candidate
+        return start
+
+    def build_messages(
+        self,
+        messages: List[Dict],
+        agent_name: str,
+        summary: Optional[str] = None,
+        offset: int = 0,
+    ) -> Tuple[List[Dict], int]:
+        """
+        Retorna los mensajes a enviar al modelo y la posición en el historial
+        completo donde empieza la ventana. `offset` es la posición del primer
+        mensaje de `messages` cuando solo se leyó el final del historial.
+        """
+        start = offset + self.window_start(messages, agent_name)
+        window = messages[start - offset :]
+        if summary and start > 0:
+            window = [
+                {
+                    "role": "system",
+                    "content": f"Summary of the earlier conversation: {summary}",
+                }
+            ] + window
+        return window, start
+
+
+class RollingSummarizer:
+    """
+    Resume en segundo plano los mensajes que quedan fuera de la ventana de
+    contexto, para que el turno del usuario no espere por el resumen
+    """
+
+    def __init__(self, get_openai_client, conversation_store, model: str = "gpt-4o-mini"):
+        # Función que retorna el cliente de OpenAI, para no crearlo antes de usarlo
+        self.get_openai_client = get_openai_client
+        self.conversation_store = conversation_store
+        self.model = model
+        self._executor = ThreadPoolExecutor(
+            max_workers=1, thread_name_prefix="swarm-summary"
+        )
+        self._pending = set()
+        self._lock = threading.Lock()
+
+    def schedule(self, user_id: str, window_start: int) -> None:
+        """
+        Programa el resumen de los mensajes anteriores a `window_start`
+        si todavía no están cubiertos por el resumen guardado
+        """
+        if window_start <= 0:
+            return
+        with self._lock:
+            if user_id in self._pending:
+                return
+            self._pending.add(user_id)
+        self._executor.submit(self._summarize, user_id, window_start)
+
+    def _summarize(self, user_id: str, window_start: int) -> None:
+        try:
+            summary, covered = self.conversation_store.get_summary(user_id)
+            if covered >= window_start:
+                return
+
+            # Solo se leen los mensajes nuevos que el resumen todavía no cubre
+            messages = self.conversation_store.get_messages(user_id, covered, window_start)
+            if not messages:
+                return
+            transcript = "\n".join(
+                f"{m['role']}: {m.get('content') or ''}" for m in messages
+            )
+            completion = self.get_openai_client().chat.completions.create(
+                model=self.model,
+                messages=[
+                    {"role": "system", "content": SUMMARY_INSTRUCTIONS},
+                    {
+                        "role": "user",
+                        "content": f"Previous summary: {summary or '(none)'}\n\nNew messages:\n{transcript}",
+                    },
+                ],
+            )
+            new_summary = completion.choices[0].message.content
+            if new_summary:
+                self.conversation_store.set_summary(user_id, new_summary, window_start)
+        except Exception as e:
+            logger.warning("Error summarizing conversation %s: %s", user_id, e)
+        finally:
+            with self._lock:
+                self._pending.discard(user_id)
+
+    def shutdown(self) -> None:
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+
+def create_context_policy() -> ContextPolicy:
+    """
+    Crea la política de contexto a partir de las variables de entorno
+    SWARM_CONTEXT_MAX_TURNS, SWARM_CONTEXT_TOKEN_BUDGET y
+    SWARM_CONTEXT_AGENT_BUDGETS (JSON {"nombre del agente": tokens})
+    """
+    return ContextPolicy(
+        max_turns=int(os.getenv("SWARM_CONTEXT_MAX_TURNS", "20")),
+        token_budget=int(os.getenv("SWARM_CONTEXT_TOKEN_BUDGET", "6000")),
+        agent_budgets=json.loads(os.getenv("SWARM_CONTEXT_AGENT_BUDGETS", "{}")),
+    )
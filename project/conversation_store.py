@@ -0,0 +1,337 @@
+import os
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import insert
+from sqlalchemy.dialects.postgresql import insert as postgresql_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.exc import IntegrityError
+from sqlmodel import Session, SQLModel, func, select, update
+
+from project.models import Conversacion, MensajeConversacion, utc_now
+
+
+class ConversationStore(ABC):
+    """
+    Interfaz para guardar el historial y el agente actual de cada usuario
+    """
+
+    @abstractmethod
+    def get_history(self, user_id: str) -> List[Dict]:
+        """
+        Retorna el historial de mensajes del usuario (lista vacía si no existe).
+        Los mensajes ya cubiertos por el resumen pueden no estar.
+        """
+
+    @abstractmethod
+    def get_recent_history(self, user_id: str, max_turns: int) -> Tuple[List[Dict], int]:
+        """
+        Retorna los mensajes de los últimos `max_turns` turnos del usuario y la
+        posición en el historial completo del primero de ellos
+        """
+
+    @abstractmethod
+    def get_messages(self, user_id: str, start: int, end: int) -> List[Dict]:
+        """
+        Retorna los mensajes entre las posiciones `start` y `end` del historial
+        completo (los que ya se descartaron no se incluyen)
+        """
+
+    @abstractmethod
+    def append_messages(self, user_id: str, messages: List[Dict]) -> None:
+        """
+        Agrega mensajes al final del historial del usuario
+        """
+
+    @abstractmethod
+    def get_agent_name(self, user_id: str) -> Optional[str]:
+        """
+        Retorna el nombre del agente actual del usuario, o None si no tiene
+        """
+
+    @abstractmethod
+    def set_agent_name(self, user_id: str, agent_name: str) -> None:
+        """
+        Guarda el nombre del agente actual del usuario
+        """
+
+    @abstractmethod
+    def get_summary(self, user_id: str) -> Tuple[Optional[str], int]:
+        """
+        Retorna el resumen de los mensajes antiguos y cuántos mensajes cubre
+        """
+
+    @abstractmethod
+    def set_summary(self, user_id: str, summary: str, covered: int) -> None:
+        """
+        Guarda el resumen de los primeros `covered` mensajes del historial.
+        El almacén puede descartar esos mensajes.
+        """
+
+    @abstractmethod
+    def size(self) -> int:
+        """
+        Retorna el número de conversaciones guardadas
+        """
+
+
+class _MemorySession:
+    def __init__(self):
+        self.history: List[Dict] = []
+        self.agent_name: Optional[str] = None
+        self.summary: Optional[str] = None
+        self.summary_covered = 0
+        # Mensajes del principio del historial ya descartados por estar resumidos
+        self.offset = 0
+        self.last_access = time.monotonic()
+
+
+class MemoryConversationStore(ConversationStore):
+    """
+    Guarda las conversaciones en memoria del proceso como un LRU con
+    expiración por inactividad (TTL) y un máximo de sesiones
+    """
+
+    def __init__(self, max_sessions: int = 10000, ttl_seconds: float = 3600):
+        self.max_sessions = max_sessions
+        self.ttl_seconds = ttl_seconds
+        self._sessions: "OrderedDict[str, _MemorySession]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _evict(self) -> None:
+        # El OrderedDict está ordenado por último acceso, así que las sesiones
+        # expiradas y las menos usadas siempre están al principio
+        now = time.monotonic()
+        while self._sessions:
+            user_id, session = next(iter(self._sessions.items()))
+            expired = now - session.last_access > self.ttl_seconds
+            if not expired and len(self._sessions) <= self.max_sessions:
+                break
+            del self._sessions[user_id]
+
+    def _touch(self, user_id: str, create: bool) -> Optional[_MemorySession]:
+        self._evict()
+        session = self._sessions.get(user_id)
+        if session is None:
+            if not create:
+                return None
+            session = self._sessions[user_id] = _MemorySession()
+        session.last_access = time.monotonic()
+        self._sessions.move_to_end(user_id)
+        self._evict()
+        return session
+
+    def get_history(self, user_id: str) -> List[Dict]:
+        with self._lock:
+            session = self._touch(user_id, create=False)
+            return list(session.history) if session else []
+
+    def get_recent_history(self, user_id: str, max_turns: int) -> Tuple[List[Dict], int]:
+        with self._lock:
+            session = self._touch(user_id, create=False)
+            if session is None:
+                return [], 0
+            turn_starts = [
+                i for i, m in enumerate(session.history) if m.get("role") == "user"
+            ][-max(max_turns, 1) :]
+            start = turn_starts[0] if turn_starts else 0
+            return session.history[start:], session.offset + start
+
+    def get_messages(self, user_id: str, start: int, end: int) -> List[Dict]:
+        with self._lock:
+            session = self._touch(user_id, create=False)
+            if session is None:
+                return []
+            return session.history[max(start - session.offset, 0) : max(end - session.offset, 0)]
+
+    def append_messages(self, user_id: str, messages: List[Dict]) -> None:
+        with self._lock:
+            self._touch(user_id, create=True).history.extend(messages)
+
+    def get_agent_name(self, user_id: str) -> Optional[str]:
+        with self._lock:
+            session = self._touch(user_id, create=False)
+            return session.agent_name if session else None
+
+    def set_agent_name(self, user_id: str, agent_name: str) -> None:
+        with self._lock:
+            self._touch(user_id, create=True).agent_name = agent_name
+
+    def get_summary(self, user_id: str) -> Tuple[Optional[str], int]:
+        with self._lock:
+            session = self._touch(user_id, create=False)
+            return (session.summary, session.summary_covered) if session else (None, 0)
+
+    def set_summary(self, user_id: str, summary: str, covered: int) -> None:
+        with self._lock:
+            session = self._touch(user_id, create=True)
+            session.summary = summary
+            session.summary_covered = covered
+            # Los mensajes resumidos ya no se envían al modelo: se descartan
+            if covered > session.offset:
+                del session.history[: covered - session.offset]
+                session.offset = covered
+
+    def size(self) -> int:
+        with self._lock:
+            self._evict()
+            return len(self._sessions)
+
+
+class SQLConversationStore(ConversationStore):
+    """
+    Guarda las conversaciones en la base de datos del proyecto, de forma que
+    varios workers compartan el mismo historial. El historial se lee bajo
+    demanda y los mensajes nuevos se insertan sin reescribir los anteriores.
+    """
+
+    def __init__(self, engine):
+        self.engine = engine
+        SQLModel.metadata.create_all(
+            engine,
+            tables=[Conversacion.__table__, MensajeConversacion.__table__],
+        )
+
+    def _ensure_conversation(self, session: Session, user_id: str) -> None:
+        """
+        Crea la conversación si no existe, sin leerla antes: dos workers que
+        atienden a la vez el primer turno de un usuario no chocan en la clave
+        primaria (INSERT ... ON CONFLICT DO NOTHING, o un savepoint en otras
+        bases de datos)
+        """
+        values = {"usuario_id": user_id, "mensajes_resumidos": 0, "actualizado_en": utc_now()}
+        dialect = session.get_bind().dialect.name
+        if dialect in ("sqlite", "postgresql"):
+            dialect_insert = sqlite_insert if dialect == "sqlite" else postgresql_insert
+            session.exec(
+                dialect_insert(Conversacion)
+                .values(**values)
+                .on_conflict_do_nothing(index_elements=["usuario_id"])
+            )
+            return
+        try:
+            with session.begin_nested():
+                session.exec(insert(Conversacion).values(**values))
+        except IntegrityError:
+            pass
+
+    def _update_conversation(self, session: Session, user_id: str, **values) -> None:
+        self._ensure_conversation(session, user_id)
+        session.exec(
+            update(Conversacion)
+            .where(Conversacion.usuario_id == user_id)
+            .values(actualizado_en=utc_now(), **values)
+        )
+
+    def _messages_query(self, user_id: str):
+        return (
+            select(MensajeConversacion)
+            .where(MensajeConversacion.usuario_id == user_id)
+            .order_by(MensajeConversacion.id)
+        )
+
+    def _as_dicts(self, mensajes) -> List[Dict]:
+        return [{"role": m.rol, "content": m.contenido} for m in mensajes]
+
+    def get_history(self, user_id: str) -> List[Dict]:
+        with Session(self.engine) as session:
+            return self._as_dicts(session.exec(self._messages_query(user_id)).all())
+
+    def get_recent_history(self, user_id: str, max_turns: int) -> Tuple[List[Dict], int]:
+        with Session(self.engine) as session:
+            # Id del mensaje del usuario que abre el turno más antiguo de la ventana
+            first_id = session.exec(
+                select(MensajeConversacion.id)
+                .where(
+                    MensajeConversacion.usuario_id == user_id,
+                    MensajeConversacion.rol == "user",
+                )
+                .order_by(MensajeConversacion.id.desc())
+                .offset(max(max_turns, 1) - 1)
+                .limit(1)
+            ).first()
+            if first_id is None:
+                return self.get_history(user_id), 0
+            offset = session.exec(
+                select(func.count())
+                .select_from(MensajeConversacion)
+                .where(
+                    MensajeConversacion.usuario_id == user_id,
+                    MensajeConversacion.id < first_id,
+                )
+            ).one()
+            mensajes = session.exec(
+                self._messages_query(user_id).where(MensajeConversacion.id >= first_id)
+            ).all()
+            return self._as_dicts(mensajes), offset
+
+    def get_messages(self, user_id: str, start: int, end: int) -> List[Dict]:
+        if end <= start:
+            return []
+        with Session(self.engine) as session:
+            mensajes = session.exec(
+                self._messages_query(user_id).offset(start).limit(end - start)
+            ).all()
+            return self._as_dicts(mensajes)
+
+    def append_messages(self, user_id: str, messages: List[Dict]) -> None:
+        with Session(self.engine) as session:
+            self._update_conversation(session, user_id)
+            session.add_all(
+                MensajeConversacion(
+                    usuario_id=user_id,
+                    rol=message["role"],
+                    contenido=message.get("content"),
+                )
+                for message in messages
+            )
+            session.commit()
+
+    def get_agent_name(self, user_id: str) -> Optional[str]:
+        with Session(self.engine) as session:
+            conversacion = session.get(Conversacion, user_id)
+            return conversacion.agente if conversacion else None
+
+    def set_agent_name(self, user_id: str, agent_name: str) -> None:
+        with Session(self.engine) as session:
+            self._update_conversation(session, user_id, agente=agent_name)
+            session.commit()
+
+    def get_summary(self, user_id: str) -> Tuple[Optional[str], int]:
+        with Session(self.engine) as session:
+            conversacion = session.get(Conversacion, user_id)
+            if conversacion is None:
+                return None, 0
+            return conversacion.resumen, conversacion.mensajes_resumidos
+
+    def set_summary(self, user_id: str, summary: str, covered: int) -> None:
+        with Session(self.engine) as session:
+            self._update_conversation(
+                session, user_id, resumen=summary, mensajes_resumidos=covered
+            )
+            session.commit()
+
+    def size(self) -> int:
+        with Session(self.engine) as session:
+            return session.exec(select(func.count()).select_from(Conversacion)).one()
+
+
+def create_conversation_store() -> ConversationStore:
+    """
+    Crea el almacén de conversaciones indicado en SWARM_CONVERSATION_STORE
+    ("memory" por defecto, o "sql" para usar la base de datos)
+    """
+    backend = os.getenv("SWARM_CONVERSATION_STORE", "memory").lower()
+    if backend == "sql":
+        from project.database import get_engine
+
+        return SQLConversationStore(get_engine())
+    if backend == "memory":
+        return MemoryConversationStore(
+            max_sessions=int(os.getenv("SWARM_CONVERSATION_MAX_SESSIONS", "10000")),
+            ttl_seconds=float(os.getenv("SWARM_CONVERSATION_TTL", "3600")),
+        )
+    raise ValueError(f"Unknown conversation store backend: {backend}")
@@ -1,18 +1,159 @@
 from sqlmodel import create_engine, Session, SQLModel
+from sqlalchemy.engine import make_url
+from sqlalchemy.pool import QueuePool, StaticPool
 from dotenv import load_dotenv
 import project.models
+from project.metrics import DB_POOL_WAIT_SECONDS, instrument_engine
+from project.product_search import ensure_search_index
 import os
+import threading
+import time
 
 load_dotenv()
 postgres_url = os.getenv("SWARM_DB_CONNECTION")
-connect_args = {"check_same_thread": False}
-engine = create_engine(
-    postgres_url, echo=False
-)  # Para mostrar los logs de las SQLModel querys
+
+
+def _env_bool(name: str, default: str) -> bool:
+    return os.getenv(name, default).lower() in ("1", "true", "yes")
+
+
+class TimedQueuePool(QueuePool):
+    """
+    QueuePool que además mide cuánto esperan los hilos por una conexión libre
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.checkouts = 0
+        self.wait_seconds_total = 0.0
+        self.max_wait_seconds = 0.0
+        self._stats_lock = threading.Lock()
+
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            return super()._do_get()
+        finally:
+            waited = time.perf_counter() - start
+            DB_POOL_WAIT_SECONDS.observe(waited)
+            with self._stats_lock:
+                self.checkouts += 1
+                self.wait_seconds_total += waited
+                self.max_wait_seconds = max(self.max_wait_seconds, waited)
+
+
+def engine_options(url: str) -> dict:
+    """
+    Opciones de create_engine según el dialecto, configurables con las variables
+    SWARM_DB_POOL_SIZE, SWARM_DB_MAX_OVERFLOW, SWARM_DB_POOL_TIMEOUT,
+    SWARM_DB_POOL_RECYCLE, SWARM_DB_POOL_PRE_PING, SWARM_DB_STATEMENT_TIMEOUT_MS
+    y SWARM_DB_ECHO
+    """
+    url = make_url(url)
+    options = {"echo": _env_bool("SWARM_DB_ECHO", "0")}  # Para mostrar los logs de las SQLModel querys
+    pool_options = {
+        "poolclass": TimedQueuePool,
+        "pool_size": int(os.getenv("SWARM_DB_POOL_SIZE", "5")),
+        "max_overflow": int(os.getenv("SWARM_DB_MAX_OVERFLOW", "10")),
+        "pool_timeout": float(os.getenv("SWARM_DB_POOL_TIMEOUT", "30")),
+        "pool_recycle": int(os.getenv("SWARM_DB_POOL_RECYCLE", "1800")),
+        "pool_pre_ping": _env_bool("SWARM_DB_POOL_PRE_PING", "1"),
+    }
+    statement_timeout_ms = int(os.getenv("SWARM_DB_STATEMENT_TIMEOUT_MS", "0"))
+
+    if url.get_backend_name() == "sqlite":
+        # Las conexiones se usan desde los hilos del pool de chat
+        options["connect_args"] = {"check_same_thread": False}
+        if url.database in (None, "", ":memory:"):
+            # Una base en memoria solo existe dentro de su conexión
+            options["poolclass"] = StaticPool
+        else:
+            pool_options["pool_pre_ping"] = False
+            options.update(pool_options)
+        return options
+
+    options.update(pool_options)
+    if url.get_backend_name() == "postgresql" and statement_timeout_ms:
+        options["connect_args"] = {"options": f"-c statement_timeout={statement_timeout_ms}"}
+    return options
+
+
+_engine = None
+_engine_pid = None
+_engine_lock = threading.Lock()
+
+
+def get_engine():
+    """
+    Retorna el engine de este proceso, creándolo en el primer uso.
+    Si el proceso es un worker creado con fork, crea su propio engine en vez
+    de compartir las conexiones del proceso padre.
+    """
+    global _engine, _engine_pid
+    if _engine is not None and _engine_pid == os.getpid():
+        return _engine
+    with _engine_lock:
+        if _engine is not None and _engine_pid != os.getpid():
+            _engine.dispose(close=False)
+            _engine = None
+        if _engine is None:
+            _engine = create_engine(postgres_url, **engine_options(postgres_url))
+            instrument_engine(_engine)
+            _engine_pid = os.getpid()
+        return _engine
+
+
+def dispose_engine() -> None:
+    """
+    Cierra las conexiones del pool (al apagar el worker)
+    """
+    global _engine
+    with _engine_lock:
+        if _engine is not None:
+            _engine.dispose()
+            _engine = None
+
+
+def pool_stats() -> dict:
+    """
+    Retorna el estado del pool de conexiones: conexiones en uso, overflow
+    y tiempo de espera por una conexión
+    """
+    if _engine is None:
+        return {"initialized": False}
+    pool = _engine.pool
+    stats = {"initialized": True, "pool": pool.__class__.__name__}
+    if isinstance(pool, QueuePool):
+        stats.update(
+            size=pool.size(),
+            checked_in=pool.checkedin(),
+            checked_out=pool.checkedout(),
+            overflow=pool.overflow(),
+        )
+    if isinstance(pool, TimedQueuePool):
+        stats.update(
+            checkouts=pool.checkouts,
+            wait_seconds_total=pool.wait_seconds_total,
+            max_wait_seconds=pool.max_wait_seconds,
+        )
+    return stats
+
+
+def __getattr__(name):
+    # Compatibilidad con `from project.database import engine`
+    if name == "engine":
+        return get_engine()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 
 def create_db_and_tables():
+    engine = get_engine()
     SQLModel.metadata.create_all(engine)
+    # create_all no agrega índices nuevos a tablas que ya existen
+    for table in SQLModel.metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(engine, checkfirst=True)
+    ensure_search_index(engine)
 
 
 if __name__ == "__main__":
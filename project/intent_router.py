@@ -0,0 +1,131 @@
+import os
+import re
+import threading
+import unicodedata
+from typing import Dict, List, Optional, Tuple
+
+
+# Verbos de modificación. Con uno de ellos en el mensaje, "precio de" o
+# "hay stock" describen qué cambiar, no una consulta.
+UPDATE_VERBS = r"(actualiza(r)?|modifica(r)?|cambia(r)?|edita(r)?|ajusta(r)?|update|modify|change|edit)"
+
+# Verbos de alta. Solos también aparecen en movimientos de inventario
+# ("agrega 10 unidades al stock"), así que solo deciden con un producto como objeto.
+ADD_VERBS = r"(agrega(r|me)?|anade|anadir|inserta(r)?|registra(r)?|da de alta|add|insert|create|register)"
+
+# Verbos de baja. Seguidos de un campo ("drop the price", "quita el descuento")
+# piden cambiar ese campo, no borrar el producto.
+DELETE_VERBS = r"(elimina(r)?|borra(r)?|quita(r)?|suprime|suprimir|da de baja|delete|remove|erase|drop)"
+
+# Un campo de producto como objeto directo del verbo ("the price", "el descuento", "3 units")
+FIELD_OBJECT = r"\s+((the|el|la|los|las|its|su|\d+)\s+)?(price|precio|stock|discount|descuento|units?|unidades)\b"
+
+# Reglas (patrón, peso) por función de cambio de agente, en español e inglés.
+# Los patrones se aplican sobre el mensaje en minúsculas y sin tildes.
+INTENT_RULES: Dict[str, List[Tuple[str, float]]] = {
+    "talk_to_lister": [
+        (r"\b(listar?|listame|listado|lista de)\b", 0.9),
+        (r"\b(muestra(me)?|mostrar|ensename|ver (los|las|todos|todas|el|la))\b", 0.8),
+        (r"\b(que|cuales|cuantos) productos\b", 0.8),
+        (rf"^(?!.*\b{UPDATE_VERBS}\b).*\b(cuanto cuesta|cuanto vale|precio de|hay stock|cuantos? hay)\b", 0.8),
+        (r"\b(list|show|display|see all|what products|how much|how many)\b", 0.8),
+        (r"\b(busca(r)?|search|find)\b", 0.6),
+    ],
+    "talk_to_adder": [
+        (rf"\b{ADD_VERBS}\b(\s+\S+){{0,3}}?\s+(productos?|products?|articulos?)\b", 0.9),
+        (r"\b(nuevo producto|crea(r)? (un |el )?producto|new product)\b", 0.9),
+        (rf"\b{ADD_VERBS}\b", 0.3),
+    ],
+    "talk_to_deleter": [
+        (rf"^(?!.*\b{DELETE_VERBS}{FIELD_OBJECT}).*\b{DELETE_VERBS}\b", 0.9),
+    ],
+    "talk_to_updater": [
+        (rf"\b{UPDATE_VERBS}\b", 0.9),
+        (r"\b(sube|baja|aumenta|reduce|rebaja) (el |la )?(precio|cantidad|stock|descuento)\b", 0.9),
+        (r"\b(set the|increase|decrease)\b", 0.9),
+        (rf"\b(drop|remove|quita(r)?|lower|raise|cut){FIELD_OBJECT}", 0.9),
+        # Movimientos de inventario (adjust_product_stock)
+        (r"\b\d+ (unidades|units?)\b", 0.9),
+        (r"\b(al|del|to the|from the)( \w+)? (stock|inventario|inventory)\b", 0.9),
+        (r"\b(vendimos|vendi|vendieron|vendio|venta de|recibimos|recibi|llegaron|sold|sale of|received|restock(ed)?)\b", 0.9),
+    ],
+}
+
+
+def normalize(text: str) -> str:
+    """
+    Pasa el texto a minúsculas y le quita las tildes
+    """
+    text = unicodedata.normalize("NFKD", text.lower())
+    return "".join(c for c in text if not unicodedata.combining(c))
+
+
+class IntentRouter:
+    """
+    Enrutador local y determinista que decide el agente para mensajes
+    claramente clasificables sin llamar al Triage Agent.
+    Los mensajes ambiguos se dejan al modelo (route retorna None).
+    """
+
+    def __init__(self, rules: Dict[str, List[Tuple[str, float]]], threshold: float = 0.6):
+        self.rules = {
+            function_name: [(re.compile(pattern), weight) for pattern, weight in patterns]
+            for function_name, patterns in rules.items()
+        }
+        self.threshold = threshold
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+    def classify(self, message: str) -> Tuple[Optional[str], float]:
+        """
+        Retorna la función de cambio de agente más probable y su confianza
+        """
+        text = normalize(message)
+        scores = {}
+        for function_name, patterns in self.rules.items():
+            score = sum(weight for pattern, weight in patterns if pattern.search(text))
+            if score:
+                scores[function_name] = min(score, 1.0)
+
+        if not scores:
+            return None, 0.0
+
+        best = max(scores, key=scores.get)
+        # La confianza baja cuando varias intenciones compiten en el mismo mensaje
+        confidence = scores[best] * scores[best] / sum(scores.values())
+        return best, confidence
+
+    def route(self, message: str) -> Optional[str]:
+        """
+        Retorna el nombre de la función de cambio de agente (por ejemplo
+        'talk_to_lister') si la confianza supera el umbral, o None
+        """
+        function_name, confidence = self.classify(message)
+        routed = function_name if confidence >= self.threshold else None
+        with self._lock:
+            if routed:
+                self.hits += 1
+            else:
+                self.misses += 1
+        return routed
+
+    def stats(self) -> Dict[str, float]:
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / total if total else 0.0,
+            }
+
+
+def create_intent_router() -> Optional[IntentRouter]:
+    """
+    Crea el enrutador local, salvo que SWARM_ROUTER_ENABLED sea "0"
+    """
+    if os.getenv("SWARM_ROUTER_ENABLED", "1") == "0":
+        return None
+    return IntentRouter(
+        INTENT_RULES, threshold=float(os.getenv("SWARM_ROUTER_THRESHOLD", "0.6"))
+    )
@@ -0,0 +1,357 @@
+import contextvars
+import logging
+import math
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+
+logger = logging.getLogger(__name__)
+
+
+# Buckets por defecto de los histogramas de latencia, en segundos
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(labelnames: Tuple[str, ...], values: Tuple[str, ...], extra: str = "") -> str:
+    parts = [f'{name}="{_escape(value)}"' for name, value in zip(labelnames, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def _format_value(value: float) -> str:
+    if value == math.inf:
+        return "+Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+class _Metric:
+    type_name = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Iterable[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+
+    def _key(self, labels: Dict[str, str]) -> Tuple[str, ...]:
+        return tuple(str(labels.get(name, "")) for name in self.labelnames)
+
+    def _header(self) -> List[str]:
+        return [
+            f"# HELP {self.name} {self.documentation}",
+            f"# TYPE {self.name} {self.type_name}",
+        ]
+
+    def render(self) -> List[str]:
+        raise NotImplementedError
+
+
+class Counter(_Metric):
+    type_name = "counter"
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._values: Dict[Tuple[str, ...], float] = {}
+
+    def inc(self, amount: float = 1, **labels) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels) -> float:
+        with self._lock:
+            return self._values.get(self._key(labels), 0)
+
+    def render(self) -> List[str]:
+        with self._lock:
+            values = sorted(self._values.items())
+        return self._header() + [
+            f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}"
+            for key, value in values
+        ]
+
+
+class Gauge(_Metric):
+    """
+    Gauge cuyo valor se calcula al leer las métricas con `function`,
+    que retorna un número o un dict {tupla de etiquetas: número}
+    """
+
+    type_name = "gauge"
+
+    def __init__(self, name: str, documentation: str, function: Callable, labelnames=()):
+        super().__init__(name, documentation, labelnames)
+        self.function = function
+
+    def render(self) -> List[str]:
+        try:
+            value = self.function()
+        except Exception as e:
+            logger.warning("Error reading metric %s: %s", self.name, e)
+            return []
+        values = value if isinstance(value, dict) else {(): value}
+        return self._header() + [
+            f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(v)}"
+            for key, v in sorted(values.items())
+        ]
+
+
+class Histogram(_Metric):
+    type_name = "histogram"
+
+    def __init__(self, *args, buckets: Iterable[float] = LATENCY_BUCKETS, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.buckets = tuple(sorted(buckets)) + (math.inf,)
+        # etiquetas -> [conteos por bucket, suma, total]
+        self._values: Dict[Tuple[str, ...], list] = {}
+
+    def observe(self, value: float, **labels) -> None:
+        key = self._key(labels)
+        with self._lock:
+            entry = self._values.get(key)
+            if entry is None:
+                entry = self._values[key] = [[0] * len(self.buckets), 0.0, 0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    entry[0][i] += 1
+                    break
+            entry[1] += value
+            entry[2] += 1
+
+    def render(self) -> List[str]:
+        with self._lock:
+            values = sorted((k, [list(v[0]), v[1], v[2]]) for k, v in self._values.items())
+        lines = self._header()
+        for key, (counts, total, count) in values:
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets, counts):
+                cumulative += bucket_count
+                le = f'le="{_format_value(bound)}"'
+                lines.append(
+                    f"{self.name}_bucket{_format_labels(self.labelnames, key, le)} {cumulative}"
+                )
+            labels = _format_labels(self.labelnames, key)
+            lines.append(f"{self.name}_sum{labels} {_format_value(total)}")
+            lines.append(f"{self.name}_count{labels} {count}")
+        return lines
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+        self._lock = threading.Lock()
+
+    def _register(self, metric: _Metric) -> _Metric:
+        with self._lock:
+            # Registrar dos veces el mismo nombre reemplaza al anterior (por
+            # ejemplo, el gauge del almacén de conversaciones al recrear la app)
+            self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, documentation: str, labelnames=()) -> Counter:
+        return self._register(Counter(name, documentation, labelnames))
+
+    def histogram(
+        self, name: str, documentation: str, labelnames=(), buckets=LATENCY_BUCKETS
+    ) -> Histogram:
+        return self._register(Histogram(name, documentation, labelnames, buckets=buckets))
+
+    def gauge(self, name: str, documentation: str, function: Callable, labelnames=()) -> Gauge:
+        return self._register(Gauge(name, documentation, function, labelnames))
+
+    def render(self) -> str:
+        """
+        Retorna todas las métricas en el formato de texto de Prometheus
+        """
+        with self._lock:
+            metrics = list(self._metrics.values())
+        lines = []
+        for metric in metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = MetricsRegistry()
+
+STAGE_SECONDS = REGISTRY.histogram(
+    "swarm_stage_duration_seconds",
+    "Duration of each stage of a chat turn",
+    ("stage",),
+)
+CHAT_SECONDS = REGISTRY.histogram(
+    "swarm_chat_duration_seconds",
+    "Duration of a whole chat request",
+    ("endpoint", "outcome"),
+)
+LLM_CALLS = REGISTRY.counter(
+    "swarm_llm_calls_total", "Chat completion calls", ("agent", "model", "outcome")
+)
+LLM_SECONDS = REGISTRY.histogram(
+    "swarm_llm_call_duration_seconds",
+    "Duration of a chat completion call (until the last chunk when streaming)",
+    ("agent", "model", "stream"),
+)
+LLM_TOKENS = REGISTRY.counter(
+    "swarm_llm_tokens_total",
+    "Tokens reported by the model: direction is in (prompt), out (completion) "
+    "or cached (prompt tokens served from the provider's prompt cache)",
+    ("model", "direction"),
+)
+LLM_CALLS_PER_TURN = REGISTRY.histogram(
+    "swarm_llm_calls_per_turn",
+    "Chat completion calls needed to answer one chat turn",
+    buckets=(0, 1, 2, 3, 4, 6, 8, 12),
+)
+LLM_FALLBACKS = REGISTRY.counter(
+    "swarm_llm_fallbacks_total",
+    "Calls that used the fallback model: after an error, as a hedge, or because the primary is down",
+    ("agent", "reason"),
+)
+TOOL_CALLS = REGISTRY.counter(
+    "swarm_tool_calls_total", "Tool calls executed by the agents", ("tool", "outcome")
+)
+TOOL_SECONDS = REGISTRY.histogram(
+    "swarm_tool_duration_seconds", "Duration of each tool call", ("tool",)
+)
+HANDOFFS = REGISTRY.counter(
+    "swarm_handoffs_total",
+    "Agent switches, by target agent and by who decided it (model or local router)",
+    ("agent", "via"),
+)
+DB_QUERIES = REGISTRY.counter("swarm_db_queries_total", "SQL statements executed")
+DB_QUERY_SECONDS = REGISTRY.histogram(
+    "swarm_db_query_duration_seconds", "Duration of each SQL statement"
+)
+DB_POOL_WAIT_SECONDS = REGISTRY.histogram(
+    "swarm_db_pool_wait_seconds",
+    "Time spent waiting for a connection from the pool",
+    buckets=(0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1, 5, 30),
+)
+ADMISSION_REJECTIONS = REGISTRY.counter(
+    "swarm_admission_rejections_total",
+    "Chat requests rejected by admission control",
+    ("reason",),
+)
+ADMISSION_WAIT_SECONDS = REGISTRY.histogram(
+    "swarm_admission_wait_seconds",
+    "Time an admitted chat request waited for its turn",
+)
+
+# Las cabeceras Server-Timing por petición se activan con SWARM_TIMING_HEADERS=1
+TIMING_HEADERS = os.getenv("SWARM_TIMING_HEADERS", "0").lower() in ("1", "true", "yes")
+
+
+class RequestTimer:
+    """
+    Acumula el tiempo de cada etapa de una petición de chat
+    """
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.stages: Dict[str, float] = {}
+        self.llm_calls = 0
+        self._lock = threading.Lock()
+
+    def add(self, stage: str, seconds: float) -> None:
+        with self._lock:
+            self.stages[stage] = self.stages.get(stage, 0.0) + seconds
+
+    def count_llm_call(self) -> None:
+        with self._lock:
+            self.llm_calls += 1
+
+    def elapsed(self) -> float:
+        return time.perf_counter() - self.started
+
+    def timings_ms(self) -> Dict[str, float]:
+        with self._lock:
+            timings = {stage: round(s * 1000, 1) for stage, s in self.stages.items()}
+        timings["total"] = round(self.elapsed() * 1000, 1)
+        return timings
+
+    def server_timing(self) -> str:
+        """
+        Retorna el valor de la cabecera Server-Timing
+        """
+        return ", ".join(f"{stage};dur={ms}" for stage, ms in self.timings_ms().items())
+
+
+_current_timer: contextvars.ContextVar[Optional[RequestTimer]] = contextvars.ContextVar(
+    "swarm_request_timer", default=None
+)
+
+
+def current_timer() -> Optional[RequestTimer]:
+    return _current_timer.get()
+
+
+@contextmanager
+def request_timer():
+    """
+    Activa un RequestTimer para el hilo actual mientras dura el bloque
+    """
+    timer = RequestTimer()
+    token = _current_timer.set(timer)
+    try:
+        yield timer
+    finally:
+        _current_timer.reset(token)
+        LLM_CALLS_PER_TURN.observe(timer.llm_calls)
+
+
+def record_stage(stage: str, seconds: float) -> None:
+    STAGE_SECONDS.observe(seconds, stage=stage)
+    timer = _current_timer.get()
+    if timer is not None:
+        timer.add(stage, seconds)
+
+
+@contextmanager
+def span(stage: str):
+    """
+    Mide la duración del bloque como una etapa de la petición actual
+    """
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        record_stage(stage, time.perf_counter() - start)
+
+
+def instrument_engine(engine) -> None:
+    """
+    Cuenta y mide las sentencias SQL del engine
+    """
+    from sqlalchemy import event
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("swarm_query_start", []).append(time.perf_counter())
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        starts = conn.info.get("swarm_query_start")
+        if not starts:
+            return
+        seconds = time.perf_counter() - starts.pop()
+        DB_QUERIES.inc()
+        DB_QUERY_SECONDS.observe(seconds)
+        timer = _current_timer.get()
+        if timer is not None:
+            timer.add("db", seconds)
+
+    @event.listens_for(engine, "handle_error")
+    def handle_error(exception_context):
+        connection = exception_context.connection
+        if connection is not None and connection.info.get("swarm_query_start"):
+            connection.info["swarm_query_start"].pop()
@@ -0,0 +1,234 @@
+import json
+import logging
+import os
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, wait
+from typing import Any, Callable, Dict, Optional, Tuple, Union
+
+from project.context_executor import ContextExecutor
+from project.metrics import LLM_FALLBACKS
+
+
+logger = logging.getLogger(__name__)
+
+
+class ModelRoute:
+    """
+    Modelos de un agente: `primary` y, opcionalmente, `fallback` si el
+    primario falla o tarda más de `timeout` segundos. Con `hedge_after`
+    (segundos, o "auto" para usar la latencia observada del primario) se lanza
+    también el fallback si el primario no respondió a tiempo, y se usa la
+    primera respuesta que llegue.
+
+    En las llamadas en streaming el modelo "responde" cuando llegan las
+    cabeceras del stream, así que `timeout` y `hedge_after` solo cubren el
+    tiempo hasta el primer byte, no la generación completa.
+    """
+
+    def __init__(
+        self,
+        primary: str,
+        fallback: Optional[str] = None,
+        timeout: Optional[float] = None,
+        hedge_after: Union[float, str, None] = None,
+    ):
+        self.primary = primary
+        self.fallback = fallback if fallback != primary else None
+        self.timeout = timeout
+        self.hedge_after = hedge_after
+
+
+class LatencyTracker:
+    """
+    Media móvil exponencial (EWMA) de la latencia de cada modelo y fallos
+    consecutivos. Un modelo con `failure_threshold` fallos seguidos se
+    considera caído durante `cooldown` segundos.
+    La latencia se guarda aparte para las llamadas en streaming, que solo
+    miden el tiempo hasta el primer byte.
+    """
+
+    def __init__(self, alpha: float = 0.2, failure_threshold: int = 3, cooldown: float = 30):
+        self.alpha = alpha
+        self.failure_threshold = failure_threshold
+        self.cooldown = cooldown
+        self._latency: Dict[Tuple[str, bool], float] = {}
+        self._failures: Dict[str, Tuple[int, float]] = {}
+        self._lock = threading.Lock()
+
+    def record(self, model: str, seconds: float, ok: bool, stream: bool = False) -> None:
+        with self._lock:
+            if ok:
+                previous = self._latency.get((model, stream))
+                self._latency[(model, stream)] = (
+                    seconds if previous is None else previous + self.alpha * (seconds - previous)
+                )
+                self._failures.pop(model, None)
+            else:
+                count, _ = self._failures.get(model, (0, 0.0))
+                self._failures[model] = (count + 1, time.monotonic())
+
+    def latency(self, model: str, stream: bool = False) -> Optional[float]:
+        with self._lock:
+            return self._latency.get((model, stream))
+
+    def is_down(self, model: str) -> bool:
+        with self._lock:
+            count, last_failure = self._failures.get(model, (0, 0.0))
+        return count >= self.failure_threshold and time.monotonic() - last_failure < self.cooldown
+
+    def latencies(self) -> Dict[Tuple[str, str], float]:
+        with self._lock:
+            return {
+                (model, str(stream).lower()): seconds
+                for (model, stream), seconds in self._latency.items()
+            }
+
+
+class ModelPolicy:
+    """
+    Decide qué modelo atiende cada llamada de un agente y aplica los plazos,
+    el fallback y las peticiones duplicadas (hedging) de su ModelRoute
+    """
+
+    def __init__(
+        self,
+        agents: Optional[Dict[str, Dict[str, Any]]] = None,
+        default: Optional[Dict[str, Any]] = None,
+        tracker: Optional[LatencyTracker] = None,
+        hedge_factor: float = 2.0,
+        min_hedge_after: float = 0.5,
+        max_workers: int = 16,
+    ):
+        self.agents = agents or {}
+        self.default = default or {}
+        self.tracker = tracker or LatencyTracker()
+        self.hedge_factor = hedge_factor
+        self.min_hedge_after = min_hedge_after
+        self.max_workers = max_workers
+        self._executor = ContextExecutor(max_workers, thread_name_prefix="swarm-hedge")
+
+    def route_for(self, agent_name: str, model: str) -> ModelRoute:
+        """
+        Retorna la ruta del agente. Sin "primary" configurado, el primario es
+        el modelo del agente.
+        """
+        options = {**self.default, **self.agents.get(agent_name, {})}
+        primary = options.pop("primary", None) or model
+        return ModelRoute(primary=primary, **options)
+
+    def _attempt(self, call: Callable, model: str, timeout: Optional[float], stream: bool):
+        start = time.perf_counter()
+        try:
+            result = call(model, timeout)
+        except Exception:
+            self.tracker.record(model, time.perf_counter() - start, ok=False, stream=stream)
+            raise
+        self.tracker.record(model, time.perf_counter() - start, ok=True, stream=stream)
+        return model, result
+
+    def _hedge_after(self, route: ModelRoute, stream: bool) -> Optional[float]:
+        if route.hedge_after != "auto":
+            return route.hedge_after
+        # Se compara con llamadas del mismo tipo: en streaming, tiempo hasta el primer byte
+        latency = self.tracker.latency(route.primary, stream)
+        if latency is None:
+            return None
+        return max(self.min_hedge_after, latency * self.hedge_factor)
+
+    def complete(
+        self,
+        agent_name: str,
+        route: ModelRoute,
+        call: Callable[[str, Optional[float]], Any],
+        discard: Callable[[Any], None] = lambda result: None,
+        stream: bool = False,
+    ) -> Tuple[str, Any]:
+        """
+        Ejecuta `call(modelo, timeout)` según la ruta y retorna (modelo, resultado).
+        `discard` recibe las respuestas que llegaron tarde en una carrera.
+        Con `stream`, `call` retorna el stream recién abierto.
+        """
+        models = [route.primary] + ([route.fallback] if route.fallback else [])
+        if route.fallback and self.tracker.is_down(route.primary):
+            # El primario viene fallando: se prueba primero el fallback
+            LLM_FALLBACKS.inc(agent=agent_name, reason="primary_down")
+            models.reverse()
+        else:
+            hedge_after = self._hedge_after(route, stream) if route.fallback else None
+            if hedge_after is not None:
+                return self._hedged(agent_name, route, call, discard, hedge_after, stream)
+
+        last_error = None
+        for i, model in enumerate(models):
+            try:
+                return self._attempt(call, model, route.timeout, stream)
+            except Exception as e:
+                last_error = e
+                if i + 1 < len(models):
+                    logger.warning(
+                        "Model %s failed for %s, trying %s: %s",
+                        model, agent_name, models[i + 1], e,
+                    )
+                    LLM_FALLBACKS.inc(agent=agent_name, reason="error")
+        raise last_error
+
+    def _hedged(self, agent_name, route, call, discard, hedge_after: float, stream: bool):
+        primary = self._executor.submit(
+            self._attempt, call, route.primary, route.timeout, stream
+        )
+        done, _ = wait([primary], timeout=hedge_after)
+        if done and primary.exception() is None:
+            return primary.result()
+
+        reason = "hedge" if not done else "error"
+        LLM_FALLBACKS.inc(agent=agent_name, reason=reason)
+        fallback = self._executor.submit(
+            self._attempt, call, route.fallback, route.timeout, stream
+        )
+        pending = {primary, fallback}
+        last_error = None
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                if future.exception() is None:
+                    # La respuesta que pierda la carrera se descarta al llegar
+                    for loser in pending:
+                        loser.add_done_callback(
+                            lambda f: discard(f.result()[1]) if f.exception() is None else None
+                        )
+                    return future.result()
+                last_error = future.exception()
+        raise last_error
+
+    def shutdown(self) -> None:
+        self._executor.shutdown()
+
+
+ROUTE_OPTIONS = ("primary", "fallback", "timeout", "hedge_after")
+
+
+def create_model_policy() -> ModelPolicy:
+    """
+    Crea la política de modelos a partir de SWARM_MODEL_POLICY, un JSON con una
+    entrada por nombre de agente y una opcional "*" que se aplica al resto, p. ej.:
+
+        {"Agent Updater": {"primary": "gpt-4o", "fallback": "gpt-4o-mini",
+                           "timeout": 20, "hedge_after": "auto"},
+         "*": {"timeout": 30}}
+
+    Sin configuración cada agente usa su propio modelo, como hasta ahora.
+    """
+    config = json.loads(os.getenv("SWARM_MODEL_POLICY", "{}") or "{}")
+    options = {
+        agent_name: {key: value for key, value in entry.items() if key in ROUTE_OPTIONS}
+        for agent_name, entry in config.items()
+    }
+    default = options.pop("*", {})
+    default.pop("primary", None)
+    return ModelPolicy(
+        agents=options,
+        default=default,
+        hedge_factor=float(os.getenv("SWARM_MODEL_HEDGE_FACTOR", "2")),
+        min_hedge_after=float(os.getenv("SWARM_MODEL_MIN_HEDGE_AFTER", "0.5")),
+    )
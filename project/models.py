@@ -1,11 +1,18 @@
+from datetime import datetime, timezone
+from typing import Optional
+
 from sqlmodel import Field, SQLModel
 
 
+def utc_now() -> datetime:
+    return datetime.now(timezone.utc)
+
+
 class Producto(SQLModel, table=True):
     id: int | None = Field(default=None, primary_key=True)
-    nombre: str = Field()
-    precio: float = Field()
-    cantidad_en_almacen: int = Field(default=0)
+    nombre: str = Field(index=True)
+    precio: float = Field(index=True)
+    cantidad_en_almacen: int = Field(default=0, index=True)
     descuento_por_devolucion: int = Field(default=10)
 
 
@@ -15,3 +22,18 @@ class Usuario(SQLModel, table=True):
     empresa: str = Field()
     email: str = Field()
     esta_de_vaciones: bool = Field(default=False)
+
+
+class Conversacion(SQLModel, table=True):
+    usuario_id: str = Field(primary_key=True)
+    agente: Optional[str] = Field(default=None)
+    resumen: Optional[str] = Field(default=None)
+    mensajes_resumidos: int = Field(default=0)
+    actualizado_en: datetime = Field(default_factory=utc_now)
+
+
+class MensajeConversacion(SQLModel, table=True):
+    id: int | None = Field(default=None, primary_key=True)
+    usuario_id: str = Field(foreign_key="conversacion.usuario_id", index=True)
+    rol: str = Field()
+    contenido: Optional[str] = Field(default=None)
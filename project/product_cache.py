@@ -0,0 +1,134 @@
+import logging
+import os
+import select
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Hashable, Optional
+
+from sqlalchemy import text
+
+
+logger = logging.getLogger(__name__)
+
+
+class ProductCache:
+    """
+    Caché en memoria para las consultas de productos, con tamaño máximo (LRU)
+    y expiración (TTL). Cada escritura en el catálogo incrementa `version`
+    y vacía la caché.
+    """
+
+    def __init__(self, max_entries: int = 256, ttl_seconds: float = 30):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.version = 0
+        self._entries: "OrderedDict[Hashable, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        """
+        Retorna el valor guardado para `key`, o `default` si no existe o expiró.
+        El valor se comparte entre llamadas, así que no debe modificarse.
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return default
+            expires_at, value = entry
+            if expires_at < time.monotonic():
+                del self._entries[key]
+                return default
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key: Hashable, value: Any, version: int) -> None:
+        """
+        Guarda `value` si el catálogo sigue en la `version` en la que se leyó,
+        para no guardar resultados de antes de una escritura concurrente
+        """
+        if self.max_entries <= 0:
+            return
+        with self._lock:
+            if version != self.version:
+                return
+            self._entries[key] = (time.monotonic() + self.ttl_seconds, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def invalidate(self) -> None:
+        with self._lock:
+            self.version += 1
+            self._entries.clear()
+
+
+class CatalogInvalidationChannel:
+    """
+    Propaga las invalidaciones de la caché entre workers usando
+    LISTEN/NOTIFY de PostgreSQL
+    """
+
+    def __init__(self, engine, cache: ProductCache, channel: str):
+        self.engine = engine
+        self.cache = cache
+        self.channel = channel
+        self._payload = str(os.getpid())
+        self._stopped = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def publish(self) -> None:
+        with self.engine.connect() as connection:
+            connection.execute(
+                text("SELECT pg_notify(:channel, :payload)"),
+                {"channel": self.channel, "payload": self._payload},
+            )
+            connection.commit()
+
+    def start(self) -> None:
+        if self._thread is None:
+            self._thread = threading.Thread(
+                target=self._listen, name="catalog-invalidation", daemon=True
+            )
+            self._thread.start()
+
+    def stop(self) -> None:
+        self._stopped.set()
+
+    def _listen(self) -> None:
+        while not self._stopped.is_set():
+            connection = None
+            try:
+                # Conexión dedicada fuera del pool, en modo autocommit
+                cargs, cparams = self.engine.dialect.create_connect_args(self.engine.url)
+                connection = self.engine.dialect.connect(*cargs, **cparams)
+                connection.autocommit = True
+                connection.cursor().execute(f'LISTEN "{self.channel}"')
+                # Pudimos perdernos avisos mientras no estábamos escuchando
+                self.cache.invalidate()
+
+                while not self._stopped.is_set():
+                    if select.select([connection], [], [], 5) == ([], [], []):
+                        continue
+                    connection.poll()
+                    payloads = [n.payload for n in connection.notifies]
+                    connection.notifies.clear()
+                    if any(payload != self._payload for payload in payloads):
+                        self.cache.invalidate()
+            except Exception as e:
+                logger.warning("Catalog invalidation listener error: %s", e)
+                self._stopped.wait(5)
+            finally:
+                if connection is not None:
+                    connection.close()
+
+
+def create_catalog_channel(engine, cache: ProductCache) -> Optional[CatalogInvalidationChannel]:
+    """
+    Crea el canal entre workers si SWARM_PRODUCT_CACHE_CHANNEL tiene un nombre
+    de canal y la base de datos es PostgreSQL
+    """
+    channel = os.getenv("SWARM_PRODUCT_CACHE_CHANNEL")
+    if not channel or engine.dialect.name != "postgresql":
+        return None
+    return CatalogInvalidationChannel(engine, cache, channel)
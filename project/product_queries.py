@@ -0,0 +1,415 @@
+import base64
+import json
+from typing import Any, Dict, List, Optional, Tuple
+
+from sqlmodel import Session, and_, delete, distinct, func, or_, select, update
+
+from project.models import Producto
+from project.product_search import (
+    fts_query,
+    match_condition,
+    producto_fts,
+    relevance_order,
+    search_backend,
+    uses_fts,
+)
+
+
+PRODUCT_FIELDS = ["nombre", "precio", "cantidad_en_almacen", "descuento_por_devolucion"]
+
+# Columnas numéricas que se pueden agregar, incluida una calculada
+AGGREGATE_FIELDS = {
+    "precio": Producto.precio,
+    "cantidad_en_almacen": Producto.cantidad_en_almacen,
+    "descuento_por_devolucion": Producto.descuento_por_devolucion,
+    "valor_en_almacen": Producto.precio * Producto.cantidad_en_almacen,
+}
+AGGREGATE_FUNCTIONS = {"sum": func.sum, "min": func.min, "max": func.max, "avg": func.avg}
+
+# Filtros por rango: nombre del parámetro -> (columna, operador)
+RANGE_FILTERS = {
+    "min_precio": ("precio", ">="),
+    "max_precio": ("precio", "<="),
+    "min_cantidad": ("cantidad_en_almacen", ">="),
+    "max_cantidad": ("cantidad_en_almacen", "<="),
+}
+
+
+def encode_cursor(value: Any, id: int) -> str:
+    """
+    Codifica la posición del último producto de una página (valor de orden e id)
+    """
+    raw = json.dumps([value, id], separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> List[Any]:
+    padding = "=" * (-len(cursor) % 4)
+    try:
+        value, id = json.loads(base64.urlsafe_b64decode(cursor + padding))
+    except Exception:
+        raise ValueError(f"Invalid cursor: {cursor}")
+    return [value, id]
+
+
+def parse_fields(fields: Optional[str]) -> List[str]:
+    """
+    Convierte "nombre,precio" en la lista de columnas a devolver.
+    Lanza ValueError si alguna columna no existe.
+    """
+    if not fields:
+        return list(PRODUCT_FIELDS)
+    selected = [f.strip() for f in fields.split(",") if f.strip()]
+    unknown = [f for f in selected if f not in PRODUCT_FIELDS]
+    if unknown:
+        raise ValueError(
+            f"Unknown fields: {', '.join(unknown)}. Valid fields: {', '.join(PRODUCT_FIELDS)}."
+        )
+    return selected
+
+
+def range_conditions(ranges: Optional[Dict[str, Any]]) -> list:
+    """
+    Convierte {"max_cantidad": 5} en condiciones sobre Producto. Se ignoran
+    los límites en None.
+    """
+    conditions = []
+    for name, value in (ranges or {}).items():
+        if value is None:
+            continue
+        if name not in RANGE_FILTERS:
+            raise ValueError(f"Unknown range filter: {name}")
+        column, operator = RANGE_FILTERS[name]
+        column = getattr(Producto, column)
+        conditions.append(column >= value if operator == ">=" else column <= value)
+    return conditions
+
+
+def product_condition(
+    session: Session,
+    filter: Optional[str] = None,
+    fuzzy: bool = False,
+    ranges: Optional[Dict[str, Any]] = None,
+):
+    """
+    Condición que combina el filtro por nombre y los filtros por rango,
+    o None si no hay ninguno
+    """
+    conditions = range_conditions(ranges)
+    if filter is not None:
+        backend = search_backend(session.get_bind())
+        conditions.insert(0, match_condition(backend, filter, fuzzy))
+    if not conditions:
+        return None
+    return conditions[0] if len(conditions) == 1 else and_(*conditions)
+
+
+def list_products(
+    session: Session,
+    filter: Optional[str] = None,
+    limit: int = 50,
+    cursor: Optional[str] = None,
+    fields: Optional[List[str]] = None,
+    order_by: str = "nombre",
+    descending: bool = False,
+    fuzzy: bool = False,
+    ranges: Optional[Dict[str, Any]] = None,
+) -> Dict[str, Any]:
+    """
+    Retorna una página de productos ordenada por `order_by` (y por id para
+    desempatar). La página siguiente se pide con `next_cursor`, que guarda
+    la posición del último producto en vez de un desplazamiento, así que
+    cada página cuesta lo mismo sin importar lo lejos que esté.
+
+    El filtro por nombre usa el índice de búsqueda si existe. Con
+    order_by="relevance" los productos se ordenan por parecido al filtro.
+    `ranges` limita precio y cantidad (ver RANGE_FILTERS).
+    """
+    if order_by not in PRODUCT_FIELDS and order_by != "relevance":
+        raise ValueError(
+            f"Cannot sort by {order_by}. Valid values: relevance, {', '.join(PRODUCT_FIELDS)}."
+        )
+    if order_by == "relevance" and filter is None:
+        raise ValueError("Sorting by relevance needs a filter.")
+    fields = fields or list(PRODUCT_FIELDS)
+
+    backend = search_backend(session.get_bind())
+    condition = product_condition(session, filter, fuzzy, ranges)
+
+    total_query = select(func.count()).select_from(Producto)
+    if condition is not None:
+        total_query = total_query.where(condition)
+    total = session.exec(total_query).one()
+
+    if order_by == "relevance":
+        page = _list_by_relevance(
+            session, backend, condition, filter, fuzzy, limit, cursor, fields, ranges
+        )
+        return {"total": total, **page}
+
+    order_column = getattr(Producto, order_by)
+
+    columns = [Producto.id, order_column] + [getattr(Producto, f) for f in fields]
+    query = select(*columns)
+    if condition is not None:
+        query = query.where(condition)
+
+    if cursor:
+        last_value, last_id = decode_cursor(cursor)
+        if descending:
+            query = query.where(
+                or_(
+                    order_column < last_value,
+                    (order_column == last_value) & (Producto.id < last_id),
+                )
+            )
+        else:
+            query = query.where(
+                or_(
+                    order_column > last_value,
+                    (order_column == last_value) & (Producto.id > last_id),
+                )
+            )
+
+    if descending:
+        query = query.order_by(order_column.desc(), Producto.id.desc())
+    else:
+        query = query.order_by(order_column, Producto.id)
+
+    # Pedimos una fila de más para saber si hay otra página
+    rows = session.exec(query.limit(limit + 1)).all()
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+
+    products = [dict(zip(fields, row[2:])) for row in rows]
+    next_cursor = encode_cursor(rows[-1][1], rows[-1][0]) if has_more else None
+    return {
+        "total": total,
+        "count": len(products),
+        "products": products,
+        "next_cursor": next_cursor,
+    }
+
+
+def _list_by_relevance(
+    session: Session,
+    backend: str,
+    condition,
+    filter: str,
+    fuzzy: bool,
+    limit: int,
+    cursor: Optional[str],
+    fields: List[str],
+    ranges: Optional[Dict[str, Any]] = None,
+) -> Dict[str, Any]:
+    # La relevancia se calcula en cada consulta, así que aquí el cursor guarda
+    # un desplazamiento; las búsquedas filtradas devuelven pocos resultados
+    offset = decode_cursor(cursor)[1] if cursor else 0
+
+    query = select(Producto.id, *[getattr(Producto, f) for f in fields])
+    if uses_fts(backend, filter):
+        query = (
+            query.join(producto_fts, producto_fts.c.rowid == Producto.id)
+            .where(producto_fts.c.nombre.op("MATCH")(fts_query(filter, fuzzy)))
+            .where(*range_conditions(ranges))
+            .order_by(producto_fts.c.rank, Producto.id)
+        )
+    else:
+        query = query.where(condition).order_by(
+            *relevance_order(backend, filter), Producto.id
+        )
+
+    rows = session.exec(query.offset(offset).limit(limit + 1)).all()
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+
+    products = [dict(zip(fields, row[1:])) for row in rows]
+    next_cursor = encode_cursor("relevance", offset + limit) if has_more else None
+    return {"count": len(products), "products": products, "next_cursor": next_cursor}
+
+
+def parse_metrics(metrics: Optional[str]) -> List[Tuple[str, Optional[str], Optional[str]]]:
+    """
+    Convierte "count,sum:cantidad_en_almacen" en [(nombre, función, columna)],
+    p. ej. [("count", None, None), ("sum_cantidad_en_almacen", "sum", "cantidad_en_almacen")].
+    Lanza ValueError si alguna métrica no es válida.
+    """
+    parsed = []
+    for metric in (metrics or "count").split(","):
+        metric = metric.strip().lower()
+        if not metric:
+            continue
+        if metric == "count":
+            parsed.append(("count", None, None))
+            continue
+        function, _, field = metric.partition(":")
+        if function not in AGGREGATE_FUNCTIONS or field not in AGGREGATE_FIELDS:
+            raise ValueError(
+                f"Invalid metric: {metric}. Use count or <function>:<field> with function in "
+                f"{', '.join(AGGREGATE_FUNCTIONS)} and field in {', '.join(AGGREGATE_FIELDS)}."
+            )
+        parsed.append((f"{function}_{field}", function, field))
+    if not parsed:
+        raise ValueError("At least one metric is required.")
+    return parsed
+
+
+def aggregate_products(
+    session: Session,
+    metrics: Optional[str] = "count",
+    group_by: Optional[str] = None,
+    filter: Optional[str] = None,
+    ranges: Optional[Dict[str, Any]] = None,
+    limit: int = 50,
+) -> Dict[str, Any]:
+    """
+    Calcula las métricas en la base de datos, en una sola consulta, sobre los
+    productos que cumplen el filtro por nombre y los rangos, opcionalmente
+    agrupados por `group_by`. Retorna las columnas, como mucho `limit` filas
+    (grupos ordenados por su valor) y el número total de grupos.
+    """
+    parsed = parse_metrics(metrics)
+    if group_by is not None and group_by not in PRODUCT_FIELDS:
+        raise ValueError(
+            f"Cannot group by {group_by}. Valid values: {', '.join(PRODUCT_FIELDS)}."
+        )
+    condition = product_condition(session, filter, False, ranges)
+
+    columns = []
+    selected = []
+    if group_by is not None:
+        group_column = getattr(Producto, group_by)
+        columns.append(group_by)
+        selected.append(group_column)
+    for name, function, field in parsed:
+        columns.append(name)
+        if function is None:
+            selected.append(func.count())
+        else:
+            selected.append(AGGREGATE_FUNCTIONS[function](AGGREGATE_FIELDS[field]))
+
+    query = select(*selected).select_from(Producto)
+    if condition is not None:
+        query = query.where(condition)
+
+    if group_by is None:
+        row = session.exec(query).one()
+        # Con una sola columna session.exec retorna el valor, no una fila
+        row = (row,) if len(selected) == 1 else row
+        return {"columns": columns, "rows": [dict(zip(columns, row))], "total": 1}
+
+    total_query = select(func.count(distinct(group_column))).select_from(Producto)
+    if condition is not None:
+        total_query = total_query.where(condition)
+    total = session.exec(total_query).one()
+
+    query = query.group_by(group_column).order_by(group_column).limit(limit)
+    rows = [dict(zip(columns, row)) for row in session.exec(query).all()]
+    return {"columns": columns, "rows": rows, "total": total}
+
+
+class StockError(ValueError):
+    """
+    Un movimiento de inventario no se puede aplicar. `reason` es "not_found",
+    "ambiguous" (varios productos con ese nombre) o "insufficient_stock".
+    """
+
+    def __init__(self, nombre: str, reason: str, message: str):
+        super().__init__(message)
+        self.nombre = nombre
+        self.reason = reason
+
+
+def adjust_stock(
+    session: Session, nombre: str, delta: int, allow_negative: bool = False
+) -> int:
+    """
+    Suma `delta` (positivo o negativo) a la cantidad en almacén del producto
+    llamado `nombre` con una sola sentencia
+    UPDATE ... SET cantidad_en_almacen = cantidad_en_almacen + delta, así que
+    los cambios simultáneos no se pisan. Salvo con `allow_negative`, no se
+    aplica si la cantidad quedaría negativa. Retorna la cantidad nueva;
+    lanza StockError si el producto no existe, si hay varios con ese nombre
+    (el movimiento se aplica a una sola fila o a ninguna) o si no hay
+    cantidad suficiente.
+    """
+    ids = session.exec(select(Producto.id).where(Producto.nombre == nombre).limit(2)).all()
+    if not ids:
+        raise StockError(nombre, "not_found", f"Product {nombre} not found in the database.")
+    if len(ids) > 1:
+        raise StockError(
+            nombre,
+            "ambiguous",
+            f"There are several products named {nombre}; the stock movement was not applied.",
+        )
+
+    stock = Producto.cantidad_en_almacen
+    statement = (
+        update(Producto).where(Producto.id == ids[0]).values(cantidad_en_almacen=stock + delta)
+    )
+    if delta < 0 and not allow_negative:
+        statement = statement.where(stock + delta >= 0)
+
+    dialect = session.get_bind().dialect
+    if dialect.update_returning:
+        quantity = session.exec(statement.returning(stock)).first()
+        if quantity is not None:
+            return quantity[0]
+    elif session.exec(statement).rowcount:
+        return session.exec(select(stock).where(Producto.id == ids[0])).one()
+
+    # Solo cuando no se aplicó se consulta por qué
+    current = session.exec(select(stock).where(Producto.id == ids[0])).first()
+    if current is None:
+        raise StockError(nombre, "not_found", f"Product {nombre} not found in the database.")
+    raise StockError(
+        nombre,
+        "insufficient_stock",
+        f"Not enough stock of {nombre}: {current} available, {-delta} requested.",
+    )
+
+
+def apply_stock_movements(
+    session: Session, movements: List[Tuple[str, int]], allow_negative: bool = False
+) -> Dict[str, int]:
+    """
+    Aplica varios movimientos (nombre, delta) en la transacción de `session`
+    y retorna la cantidad nueva de cada producto. Los movimientos de un mismo
+    producto se suman en una sola sentencia, y los productos se actualizan
+    ordenados por nombre para que dos lotes simultáneos no se bloqueen entre
+    sí. Si alguno falla se lanza StockError y quien llama debe deshacer la
+    transacción, así que se aplican todos o ninguno.
+    """
+    deltas: Dict[str, int] = {}
+    for nombre, delta in movements:
+        deltas[nombre] = deltas.get(nombre, 0) + int(delta)
+    quantities = {}
+    for nombre in sorted(deltas):
+        quantities[nombre] = adjust_stock(session, nombre, deltas[nombre], allow_negative)
+    return quantities
+
+
+def _affected_rows(session: Session, statement) -> int:
+    """
+    Ejecuta un UPDATE/DELETE en una sola sentencia y retorna cuántas filas
+    cambió, usando RETURNING cuando la base de datos lo soporta
+    """
+    dialect = session.get_bind().dialect
+    if dialect.update_returning and dialect.delete_returning:
+        return len(session.exec(statement.returning(Producto.id)).all())
+    return session.exec(statement).rowcount
+
+
+def update_products_by_name(session: Session, nombre: str, values: Dict[str, Any]) -> int:
+    """
+    Actualiza los productos llamados `nombre` y retorna cuántos cambiaron
+    """
+    statement = update(Producto).where(Producto.nombre == nombre).values(**values)
+    return _affected_rows(session, statement)
+
+
+def delete_products_by_name(session: Session, nombre: str) -> int:
+    """
+    Elimina los productos llamados `nombre` y retorna cuántos se eliminaron
+    """
+    return _affected_rows(session, delete(Producto).where(Producto.nombre == nombre))
@@ -0,0 +1,131 @@
+import sqlite3
+from functools import lru_cache
+
+from sqlalchemy import case, column, func, inspect, table, text
+
+from project.models import Producto
+
+
+# Tabla FTS5 (tokenizador trigram) que indexa Producto.nombre en SQLite
+producto_fts = table("producto_fts", column("rowid"), column("rank"), column("nombre"))
+
+SQLITE_FTS_STATEMENTS = [
+    """
+    CREATE VIRTUAL TABLE IF NOT EXISTS producto_fts USING fts5(
+        nombre, content='producto', content_rowid='id', tokenize='trigram'
+    )
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS producto_fts_ai AFTER INSERT ON producto BEGIN
+        INSERT INTO producto_fts(rowid, nombre) VALUES (new.id, new.nombre);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS producto_fts_ad AFTER DELETE ON producto BEGIN
+        INSERT INTO producto_fts(producto_fts, rowid, nombre) VALUES ('delete', old.id, old.nombre);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS producto_fts_au AFTER UPDATE OF nombre ON producto BEGIN
+        INSERT INTO producto_fts(producto_fts, rowid, nombre) VALUES ('delete', old.id, old.nombre);
+        INSERT INTO producto_fts(rowid, nombre) VALUES (new.id, new.nombre);
+    END
+    """,
+    "INSERT INTO producto_fts(producto_fts) VALUES ('rebuild')",
+]
+
+POSTGRES_TRGM_STATEMENTS = [
+    "CREATE EXTENSION IF NOT EXISTS pg_trgm",
+    "CREATE INDEX IF NOT EXISTS ix_producto_nombre_trgm ON producto USING gin (nombre gin_trgm_ops)",
+]
+
+
+def ensure_search_index(engine) -> None:
+    """
+    Crea el índice de búsqueda por nombre: trigramas GIN (pg_trgm) en
+    PostgreSQL o una tabla FTS5 con tokenizador trigram en SQLite
+    """
+    if engine.dialect.name == "postgresql":
+        statements = POSTGRES_TRGM_STATEMENTS
+    elif engine.dialect.name == "sqlite" and sqlite3.sqlite_version_info >= (3, 34, 0):
+        statements = SQLITE_FTS_STATEMENTS
+    else:
+        return
+
+    with engine.begin() as connection:
+        for statement in statements:
+            connection.execute(text(statement))
+    search_backend.cache_clear()
+
+
+@lru_cache(maxsize=None)
+def search_backend(engine) -> str:
+    """
+    Retorna el tipo de búsqueda disponible en la base de datos:
+    "trigram" (PostgreSQL con pg_trgm), "fts5" (SQLite) o "like" (sin índice)
+    """
+    try:
+        if engine.dialect.name == "postgresql":
+            with engine.connect() as connection:
+                installed = connection.execute(
+                    text("SELECT 1 FROM pg_extension WHERE extname = 'pg_trgm'")
+                ).first()
+            return "trigram" if installed else "like"
+        if engine.dialect.name == "sqlite":
+            return "fts5" if inspect(engine).has_table("producto_fts") else "like"
+    except Exception:
+        pass
+    return "like"
+
+
+def fts_query(term: str, fuzzy: bool) -> str:
+    """
+    Construye la consulta MATCH de FTS5. En modo fuzzy se buscan los
+    trigramas del término por separado, así que una errata solo afecta
+    a algunos de ellos.
+    """
+    term = term.lower()
+    if not fuzzy:
+        return '"' + term.replace('"', '""') + '"'
+    trigrams = {term[i : i + 3] for i in range(len(term) - 2)}
+    return " OR ".join('"' + t.replace('"', '""') + '"' for t in sorted(trigrams))
+
+
+def uses_fts(backend: str, term: str) -> bool:
+    # El tokenizador trigram necesita al menos 3 caracteres
+    return backend == "fts5" and len(term) >= 3
+
+
+def match_condition(backend: str, term: str, fuzzy: bool = False):
+    """
+    Condición sobre Producto que selecciona los productos cuyo nombre
+    contiene `term` (o se le parece, si `fuzzy` es True)
+    """
+    substring = Producto.nombre.ilike(f"%{term}%")
+    if backend == "trigram" and fuzzy:
+        return substring | Producto.nombre.op("%")(term)
+    if uses_fts(backend, term):
+        matches = (
+            producto_fts.select()
+            .with_only_columns(producto_fts.c.rowid)
+            .where(producto_fts.c.nombre.op("MATCH")(fts_query(term, fuzzy)))
+        )
+        return Producto.id.in_(matches)
+    return substring
+
+
+def relevance_order(backend: str, term: str) -> list:
+    """
+    Criterios de orden por relevancia para `term`, del más al menos parecido
+    """
+    if backend == "trigram":
+        return [func.similarity(Producto.nombre, term).desc()]
+    # Sin índice: primero coincidencias exactas, luego prefijos, luego nombres cortos
+    return [
+        case(
+            (func.lower(Producto.nombre) == term.lower(), 0),
+            (Producto.nombre.ilike(f"{term}%"), 1),
+            else_=2,
+        ),
+        func.length(Producto.nombre),
+    ]
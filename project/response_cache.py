@@ -0,0 +1,120 @@
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Iterable, List, Optional, Set
+
+
+def normalize_text(text: Optional[str]) -> str:
+    """
+    Normaliza un mensaje para que variaciones de mayúsculas y espacios
+    compartan la misma entrada de caché
+    """
+    return re.sub(r"\s+", " ", (text or "").strip().lower())
+
+
+def called_tools(messages: Iterable[Dict]) -> Set[str]:
+    """
+    Retorna los nombres de las herramientas llamadas en los mensajes de un turno
+    """
+    names = set()
+    for message in messages:
+        for tool_call in message.get("tool_calls") or []:
+            names.add(tool_call["function"]["name"])
+    return names
+
+
+def is_cacheable_turn(
+    messages: Iterable[Dict], read_tools: Set[str], neutral_tools: Set[str]
+) -> bool:
+    """
+    Un turno se puede cachear si llamó al menos a una herramienta de lectura
+    y todas las demás herramientas que llamó son de lectura o neutras
+    (por ejemplo, cambios de agente)
+    """
+    names = called_tools(messages)
+    return bool(names & read_tools) and names <= read_tools | neutral_tools
+
+
+class ResponseCache:
+    """
+    Caché LRU de respuestas del modelo para turnos de solo lectura.
+    La clave incluye el agente, el modelo, los últimos mensajes normalizados y
+    la versión del catálogo, así que cualquier escritura de productos deja
+    obsoletas las entradas anteriores.
+    """
+
+    def __init__(
+        self, max_entries: int = 512, ttl_seconds: float = 300, history_messages: int = 3
+    ):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.history_messages = history_messages
+        self.hits = 0
+        self.misses = 0
+        self._catalog_version = None
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def make_key(self, agent, messages: List[Dict], catalog_version: int) -> str:
+        recent = [
+            [message.get("role"), normalize_text(message.get("content"))]
+            for message in messages[-self.history_messages :]
+        ]
+        raw = json.dumps(
+            [agent.name, agent.model, catalog_version, recent], ensure_ascii=False
+        )
+        return hashlib.sha256(raw.encode()).hexdigest()
+
+    def _check_version(self, catalog_version: int) -> None:
+        # Una escritura en el catálogo invalida todas las respuestas guardadas
+        if catalog_version != self._catalog_version:
+            self._entries.clear()
+            self._catalog_version = catalog_version
+
+    def get(self, key: str, catalog_version: int) -> Optional[Any]:
+        with self._lock:
+            self._check_version(catalog_version)
+            entry = self._entries.get(key)
+            if entry is None or entry[0] < time.monotonic():
+                self._entries.pop(key, None)
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def set(self, key: str, value: Any, catalog_version: int) -> None:
+        with self._lock:
+            self._check_version(catalog_version)
+            self._entries[key] = (time.monotonic() + self.ttl_seconds, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def stats(self) -> Dict[str, float]:
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / total if total else 0.0,
+            }
+
+
+def create_response_cache() -> Optional[ResponseCache]:
+    """
+    Crea la caché de respuestas, salvo que SWARM_RESPONSE_CACHE_SIZE sea 0
+    """
+    max_entries = int(os.getenv("SWARM_RESPONSE_CACHE_SIZE", "512"))
+    if max_entries <= 0:
+        return None
+    return ResponseCache(
+        max_entries=max_entries,
+        ttl_seconds=float(os.getenv("SWARM_RESPONSE_CACHE_TTL", "300")),
+        history_messages=int(os.getenv("SWARM_RESPONSE_CACHE_HISTORY", "3")),
+    )
@@ -0,0 +1,76 @@
+import threading
+from typing import Any, Callable, Dict, Hashable, Optional
+
+
+class _Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result: Any = None
+        self.error: Optional[BaseException] = None
+        self.shared = True
+
+
+class SingleFlight:
+    """
+    Agrupa llamadas idénticas y concurrentes: la primera (líder) ejecuta la
+    función y las demás esperan su resultado en vez de repetir el trabajo.
+
+    Si el líder tarda más de `timeout` segundos, o su resultado no se puede
+    compartir según `shareable`, cada seguidor ejecuta la función por su cuenta.
+    """
+
+    def __init__(self, timeout: float = 30):
+        self.timeout = timeout
+        self.leaders = 0
+        self.coalesced = 0
+        self.timeouts = 0
+        self._calls: Dict[Hashable, _Call] = {}
+        self._lock = threading.Lock()
+
+    def do(
+        self,
+        key: Hashable,
+        function: Callable[[], Any],
+        shareable: Optional[Callable[[Any], bool]] = None,
+    ) -> Any:
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+                self.leaders += 1
+            else:
+                self.coalesced += 1
+
+        if leader:
+            try:
+                call.result = function()
+                if shareable is not None:
+                    call.shared = shareable(call.result)
+                return call.result
+            except BaseException as e:
+                call.error = e
+                raise
+            finally:
+                with self._lock:
+                    self._calls.pop(key, None)
+                call.done.set()
+
+        if not call.done.wait(self.timeout):
+            with self._lock:
+                self.timeouts += 1
+            return function()
+        if call.error is not None:
+            raise call.error
+        if not call.shared:
+            return function()
+        return call.result
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                "leaders": self.leaders,
+                "coalesced": self.coalesced,
+                "timeouts": self.timeouts,
+                "in_flight": len(self._calls),
+            }
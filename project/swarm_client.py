@@ -0,0 +1,181 @@
+import time
+from collections import defaultdict
+from typing import Optional
+
+from swarm import Swarm
+from swarm.types import Response
+from swarm.util import debug_print
+
+from project.agent_prompts import PromptRegistry, normalize_instructions
+from project.model_policy import ModelPolicy
+from project.tool_executor import ToolExecutor
+from project.metrics import (
+    HANDOFFS,
+    LLM_CALLS,
+    LLM_SECONDS,
+    LLM_TOKENS,
+    TOOL_CALLS,
+    TOOL_SECONDS,
+    current_timer,
+    record_stage,
+)
+
+
+class SwarmClient(Swarm):
+    """
+    Cliente de Swarm que mide las llamadas al modelo y a las herramientas, y
+    elige el modelo de cada llamada según la política de modelos. Con un
+    `tool_executor`, las lecturas de un mismo mensaje se ejecutan en paralelo.
+    El mensaje de sistema y las herramientas de cada agente salen de
+    `prompt_registry`, calculados una sola vez.
+    """
+
+    def __init__(
+        self,
+        client=None,
+        model_policy: Optional[ModelPolicy] = None,
+        tool_executor: Optional[ToolExecutor] = None,
+        prompt_registry: Optional[PromptRegistry] = None,
+    ):
+        super().__init__(client)
+        self.model_policy = model_policy or ModelPolicy()
+        self.tool_executor = tool_executor
+        self.prompt_registry = prompt_registry or PromptRegistry()
+
+    def completion_params(self, agent, history, context_variables, stream) -> dict:
+        """
+        Parámetros de la llamada al modelo, igual que Swarm.get_chat_completion
+        pero sin el modelo. El mensaje de sistema y las herramientas son los
+        congelados del agente, así que el prefijo (herramientas y mensaje de
+        sistema) es el mismo en todas las llamadas.
+        """
+        prompt = self.prompt_registry.get(agent)
+        system_message = prompt.system_message
+        if system_message is None:
+            instructions = agent.instructions(defaultdict(str, context_variables))
+            system_message = {"role": "system", "content": normalize_instructions(instructions)}
+        messages = [system_message] + history
+
+        tools = prompt.tools
+        params = {
+            "messages": messages,
+            "tools": tools or None,
+            "tool_choice": agent.tool_choice,
+            "stream": stream,
+        }
+        if tools:
+            params["parallel_tool_calls"] = agent.parallel_tool_calls
+        if stream:
+            # El último fragmento trae el uso de tokens de la llamada
+            params["stream_options"] = {"include_usage": True}
+        return params
+
+    def get_chat_completion(
+        self, agent, history, context_variables, model_override, stream, debug
+    ):
+        params = self.completion_params(agent, history, context_variables, stream)
+        debug_print(debug, "Getting chat completion for...:", params["messages"])
+        route = self.model_policy.route_for(agent.name, model_override or agent.model)
+        start = time.perf_counter()
+
+        def call(model: str, timeout: Optional[float]):
+            return self._create(agent.name, model, timeout, route.fallback, params)
+
+        model, completion = self.model_policy.complete(
+            agent.name, route, call, discard=self._discard, stream=stream
+        )
+        if stream:
+            return self._timed_stream(completion, agent.name, model, start)
+
+        self._record_completion(agent.name, model, False, time.perf_counter() - start)
+        self._record_usage(model, getattr(completion, "usage", None))
+        return completion
+
+    def _create(self, agent_name: str, model: str, timeout, fallback, params: dict):
+        timer = current_timer()
+        if timer is not None:
+            timer.count_llm_call()
+        client = self.client
+        if timeout is not None or fallback:
+            # Con un fallback disponible no se reintenta el mismo modelo
+            options = {"max_retries": 0} if fallback else {}
+            if timeout is not None:
+                options["timeout"] = timeout
+            client = client.with_options(**options)
+        try:
+            return client.chat.completions.create(model=model, **params)
+        except Exception:
+            LLM_CALLS.inc(agent=agent_name, model=model, outcome="error")
+            raise
+
+    @staticmethod
+    def _discard(completion) -> None:
+        # Un stream que perdió la carrera se cierra para liberar la conexión
+        close = getattr(completion, "close", None)
+        if close is not None:
+            close()
+
+    def _timed_stream(self, completion, agent_name: str, model: str, start: float):
+        # En streaming la llamada termina cuando llega el último fragmento
+        try:
+            for chunk in completion:
+                if not chunk.choices:
+                    # Fragmento final con el uso (stream_options.include_usage).
+                    # No se reenvía: Swarm lee choices[0] de cada fragmento.
+                    self._record_usage(model, getattr(chunk, "usage", None))
+                    continue
+                yield chunk
+        finally:
+            self._record_completion(agent_name, model, True, time.perf_counter() - start)
+
+    @staticmethod
+    def _record_usage(model: str, usage) -> None:
+        if usage is None:
+            return
+        LLM_TOKENS.inc(usage.prompt_tokens or 0, model=model, direction="in")
+        LLM_TOKENS.inc(usage.completion_tokens or 0, model=model, direction="out")
+        # Tokens de entrada que el proveedor sirvió desde su caché de prompts
+        details = getattr(usage, "prompt_tokens_details", None)
+        cached = getattr(details, "cached_tokens", None) or 0
+        LLM_TOKENS.inc(cached, model=model, direction="cached")
+
+    def _record_completion(self, agent_name: str, model: str, stream: bool, seconds: float):
+        LLM_CALLS.inc(agent=agent_name, model=model, outcome="ok")
+        LLM_SECONDS.observe(seconds, agent=agent_name, model=model, stream=str(stream).lower())
+        record_stage("llm", seconds)
+
+    def _run_tool_call(self, tool_call, functions, context_variables, debug) -> Response:
+        # Se ejecuta cada tool call por separado para medir su duración
+        name = tool_call.function.name
+        start = time.perf_counter()
+        try:
+            partial_response = super().handle_tool_calls(
+                [tool_call], functions, context_variables, debug
+            )
+        except Exception:
+            TOOL_CALLS.inc(tool=name, outcome="error")
+            raise
+        finally:
+            seconds = time.perf_counter() - start
+            TOOL_SECONDS.observe(seconds, tool=name)
+            record_stage("tool", seconds)
+        TOOL_CALLS.inc(tool=name, outcome="ok")
+        return partial_response
+
+    def handle_tool_calls(self, tool_calls, functions, context_variables, debug) -> Response:
+        def run_one(tool_call):
+            return self._run_tool_call(tool_call, functions, context_variables, debug)
+
+        if self.tool_executor is None:
+            partial_responses = [run_one(tool_call) for tool_call in tool_calls]
+        else:
+            partial_responses = self.tool_executor.run(tool_calls, run_one)
+
+        response = Response(messages=[], agent=None, context_variables={})
+        for partial_response in partial_responses:
+            response.messages.extend(partial_response.messages)
+            response.context_variables.update(partial_response.context_variables)
+            if partial_response.agent:
+                response.agent = partial_response.agent
+                HANDOFFS.inc(agent=partial_response.agent.name, via="model")
+        return response
@@ -0,0 +1,65 @@
+import os
+from concurrent.futures import wait
+from typing import Any, Callable, Iterable, List, Optional
+
+from project.context_executor import ContextExecutor
+
+
+class ToolExecutor:
+    """
+    Ejecuta las tool calls de un mensaje del modelo. Las herramientas de
+    solo lectura consecutivas se ejecutan a la vez en un pool de hilos; el
+    resto (escrituras y cambios de agente) se ejecutan de una en una y en
+    orden, y hacen de barrera: ninguna lectura posterior empieza antes de
+    que terminen. Los resultados se retornan en el orden de las tool calls.
+    """
+
+    def __init__(self, read_only_tools: Iterable[str], max_workers: int = 8):
+        self.read_only_tools = set(read_only_tools)
+        self.max_workers = max_workers
+        self._executor = ContextExecutor(max_workers, thread_name_prefix="swarm-tool")
+
+    def batches(self, tool_calls: List[Any]) -> List[List[Any]]:
+        """
+        Agrupa las tool calls: cada grupo es una racha de lecturas
+        consecutivas o una sola herramienta de escritura
+        """
+        batches: List[List[Any]] = []
+        for tool_call in tool_calls:
+            read_only = tool_call.function.name in self.read_only_tools
+            if read_only and batches and batches[-1][0].function.name in self.read_only_tools:
+                batches[-1].append(tool_call)
+            else:
+                batches.append([tool_call])
+        return batches
+
+    def run(self, tool_calls: List[Any], run_one: Callable[[Any], Any]) -> List[Any]:
+        """
+        Ejecuta `run_one(tool_call)` para cada tool call y retorna los
+        resultados en orden. Si una lectura falla, se esperan las demás del
+        grupo y se relanza el primer error.
+        """
+        results = []
+        for batch in self.batches(tool_calls):
+            if len(batch) == 1:
+                results.append(run_one(batch[0]))
+                continue
+            futures = [self._executor.submit(run_one, tool_call) for tool_call in batch]
+            wait(futures)
+            results.extend(future.result() for future in futures)
+        return results
+
+    def shutdown(self) -> None:
+        self._executor.shutdown()
+
+
+def create_tool_executor(read_only_tools: Iterable[str]) -> Optional[ToolExecutor]:
+    """
+    Crea el ejecutor de tool calls con SWARM_TOOL_WORKERS hilos para las
+    lecturas en paralelo. Con 0 o 1 las tool calls se ejecutan en orden,
+    como hace Swarm.
+    """
+    max_workers = int(os.getenv("SWARM_TOOL_WORKERS", "8"))
+    if max_workers <= 1:
+        return None
+    return ToolExecutor(read_only_tools, max_workers=max_workers)
@@ -0,0 +1,56 @@
+import csv
+import io
+import os
+from typing import Any, Dict, List, Optional, Sequence
+
+
+# Formato de los resultados tabulares de las herramientas: "compact" (cabecera
+# y filas CSV) o "json" (la lista de diccionarios, como antes)
+TOOL_RESULT_FORMAT = os.getenv("SWARM_TOOL_RESULT_FORMAT", "compact").lower()
+
+# Máximo de filas que una herramienta devuelve al modelo en un resultado
+TOOL_MAX_ROWS = int(os.getenv("SWARM_TOOL_MAX_ROWS", "50"))
+
+
+def compact_enabled() -> bool:
+    return TOOL_RESULT_FORMAT == "compact"
+
+
+def _cell(value: Any) -> Any:
+    if value is None:
+        return ""
+    if isinstance(value, float) and value.is_integer():
+        return int(value)
+    return value
+
+
+def format_table(
+    columns: Sequence[str],
+    rows: List[Dict[str, Any]],
+    total: Optional[int] = None,
+    next_cursor: Optional[str] = None,
+    max_rows: Optional[int] = None,
+) -> str:
+    """
+    Convierte filas en un texto compacto para el modelo: una línea de resumen,
+    la cabecera con los nombres de las columnas una sola vez y una línea CSV
+    por fila. Las filas que pasen de `max_rows` no se muestran y se indica
+    cuántas faltan; si hay `next_cursor` (paginación), se indica cómo pedir
+    la página siguiente. Quien pagina con cursor debe pedir como mucho
+    `max_rows` filas por página, para no saltarse filas.
+    """
+    max_rows = TOOL_MAX_ROWS if max_rows is None else max_rows
+    shown = rows[:max_rows]
+
+    output = io.StringIO()
+    output.write(f"total: {len(rows) if total is None else total}, showing: {len(shown)}\n")
+    writer = csv.writer(output, lineterminator="\n")
+    writer.writerow(columns)
+    for row in shown:
+        writer.writerow([_cell(row.get(column)) for column in columns])
+
+    if next_cursor is not None:
+        output.write(f'[more available: call again with cursor="{next_cursor}"]\n')
+    elif len(rows) > len(shown):
+        output.write(f"[more available: {len(rows) - len(shown)} more rows not shown]\n")
+    return output.getvalue().rstrip("\n")